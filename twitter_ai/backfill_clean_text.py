@@ -0,0 +1,55 @@
+import argparse
+import logging
+from utils.config import configure_logging
+from utils.db_utils import get_db_connection
+from utils.text_utils import clean_tweet_text
+
+configure_logging()
+
+BATCH_ROWS = 5000
+
+
+def backfill_clean_text(db, batch_rows=BATCH_ROWS):
+    """
+    Computes clean_text of the tweets stored before it was computed at ingestion. Tweets
+    are walked by primary key and updated one batch per statement, so every transaction
+    locks at most `batch_rows` rows.
+    """
+    select_query = """
+        SELECT tweet_id, tweet_text
+        FROM tweets
+        WHERE tweet_id > %s AND clean_text IS NULL
+        ORDER BY tweet_id
+        LIMIT %s;
+    """
+    update_query = """
+        UPDATE tweets
+        SET clean_text = cleaned.clean_text,
+            clean_text_length = length(cleaned.clean_text)
+        FROM unnest(%s::varchar[], %s::text[]) AS cleaned(tweet_id, clean_text)
+        WHERE tweets.tweet_id = cleaned.tweet_id;
+    """
+    last_tweet_id = ""
+    updated = 0
+    while True:
+        rows = db.run_query(select_query, (last_tweet_id, batch_rows))
+        if not rows:
+            break
+        tweet_ids = [tweet_id for tweet_id, _ in rows]
+        clean_texts = [clean_tweet_text(tweet_text) for _, tweet_text in rows]
+        db.run_query(update_query, (tweet_ids, clean_texts))
+        last_tweet_id = tweet_ids[-1]
+        updated += len(rows)
+        logging.info(f"Computed clean_text of {updated} tweets")
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute clean_text of the tweets stored before it was added."
+    )
+    parser.add_argument("--batch_rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    with get_db_connection() as db:
+        backfill_clean_text(db, args.batch_rows)
@@ -0,0 +1,69 @@
+import argparse
+import logging
+from utils.config import configure_logging
+from utils.db_utils import get_db_connection
+from utils.minhash import tweet_minhash
+
+configure_logging()
+
+BATCH_ROWS = 5000
+
+
+def backfill_minhashes(db, batch_rows=BATCH_ROWS):
+    """
+    Computes the signatures of tweets stored before minhashes were computed at ingestion
+    and assigns them to the cluster of a matching tweet if there is one. Tweets are walked
+    in the text order of the tweet_id primary key, which is the chronological order only
+    among ids of the same length. Tweets made only of links keep a NULL minhash like at
+    ingestion, every processed tweet gets a dup_cluster_id so later runs skip it.
+    """
+    select_query = """
+        SELECT tweet_id, tweet_text
+        FROM tweets
+        WHERE tweet_id > %s AND minhash IS NULL AND dup_cluster_id IS NULL
+        ORDER BY tweet_id
+        LIMIT %s;
+    """
+    update_query = """
+        UPDATE tweets
+        SET minhash = %s,
+            lsh_bands = %s,
+            dup_cluster_id = COALESCE(
+                (
+                    SELECT o.dup_cluster_id FROM tweets o
+                    WHERE o.lsh_bands && %s::bigint[]
+                    AND o.tweet_id <> %s
+                    AND o.dup_cluster_id IS NOT NULL
+                    LIMIT 1
+                ),
+                %s
+            )
+        WHERE tweet_id = %s;
+    """
+    last_tweet_id = ""
+    updated = 0
+    while True:
+        rows = db.run_query(select_query, (last_tweet_id, batch_rows))
+        if not rows:
+            break
+        params_list = []
+        for tweet_id, tweet_text in rows:
+            minhash, bands = tweet_minhash(tweet_text)
+            params_list.append((minhash, bands, bands, tweet_id, tweet_id, tweet_id))
+        last_tweet_id = rows[-1][0]
+        # Executed row by row, so every tweet sees the clusters of the previous ones
+        db.run_batch_query(update_query, params_list)
+        updated += len(rows)
+        logging.info(f"Computed minhashes of {updated} tweets")
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute minhashes and duplicate clusters of existing tweets."
+    )
+    parser.add_argument("--batch_rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    with get_db_connection() as db:
+        backfill_minhashes(db, args.batch_rows)
@@ -0,0 +1,36 @@
+import argparse
+import json
+
+
+def compare(baseline, candidate):
+    """
+    Returns (name, baseline median, candidate median, ratio) for every benchmark in both files.
+    """
+    rows = []
+    for name, result in candidate["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median"]
+        after = result["median"]
+        rows.append((name, before, after, after / before if before else float("inf")))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the median timings of two benchmark result files."
+    )
+    parser.add_argument("baseline", type=str, help="Results of the reference commit.")
+    parser.add_argument("candidate", type=str, help="Results to compare.")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline["scale"] != candidate["scale"]:
+        print(f"Warning: scales differ {baseline['scale']} vs {candidate['scale']}")
+    print(f"{'benchmark':32} {str(baseline['commit']):>14} {str(candidate['commit']):>14}  ratio")
+    for name, before, after, ratio in compare(baseline, candidate):
+        print(f"{name:32} {before * 1000:12.1f}ms {after * 1000:12.1f}ms  {ratio:.2f}x")
@@ -0,0 +1,309 @@
+"""
+Generates GraphQL responses shaped like UserTweets, ConnectTabTimeline and UsersByRestIds,
+including note tweets, retweets, quotes, media, cards and malformed entries.
+
+The files are written with the layout of archived responses, so they can be ingested with
+replay_archive.py:
+
+    python benchmarks/payloads.py /tmp/payloads --user_tweets_pages 1000 --malformed_rate 0.05
+    python replay_archive.py /tmp/payloads
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import SyntheticData, user_id, user_index, tweet_id
+
+# Relative frequency of every kind of tweet in UserTweets pages
+TWEET_KINDS = {
+    "plain": 50,
+    "note": 10,
+    "retweet": 15,
+    "quote": 10,
+    "media": 10,
+    "card": 5,
+}
+MALFORMED_TWEET_ENTRIES = ["missing_item_content", "tombstone", "missing_legacy"]
+MALFORMED_USER_ENTRIES = ["missing_user_results", "empty_rest_id"]
+
+
+def cursor_entry(position, value):
+    return {
+        "entryId": f"cursor-{position}-{value}",
+        "content": {
+            "entryType": "TimelineTimelineCursor",
+            "value": str(value),
+            "cursorType": position.capitalize(),
+        },
+    }
+
+
+class PayloadGenerator(SyntheticData):
+    """
+    Builds GraphQL responses for the synthetic population of SyntheticData.
+
+    `malformed_rate` is the share of entries replaced by entries the parsers must skip.
+    The rest ids of the well formed tweets and users are collected in `expected`, so that
+    the output of a parser can be checked against them.
+    """
+
+    def __init__(self, users_count, seed=0, now=None, malformed_rate=0.02):
+        super().__init__(users_count, seed=seed, now=now)
+        self.malformed_rate = malformed_rate
+        self.expected = {"tweets": set(), "users": set(), "malformed": 0}
+        self.kinds = list(TWEET_KINDS)
+        self.weights = list(TWEET_KINDS.values())
+
+    def is_malformed(self):
+        if self.rng.random() < self.malformed_rate:
+            self.expected["malformed"] += 1
+            return True
+        return False
+
+    def core(self, author_id):
+        return {"user_results": {"result": self.user_result(user_index(author_id))}}
+
+    def rich_tweet_result(self, index, author_index=None, kind=None):
+        tweet = self.tweet_result(index, author_index, with_retweet=False)
+        legacy = tweet["legacy"]
+        kind = kind or self.rng.choices(self.kinds, self.weights)[0]
+        legacy["conversation_id_str"] = tweet["rest_id"]
+        legacy["id_str"] = tweet["rest_id"]
+        tweet["__typename"] = "Tweet"
+        tweet["source"] = '<a href="https://mobile.twitter.com">Twitter Web App</a>'
+
+        if kind == "note":
+            long_text = " ".join(self.random_text(40) for _ in range(4))
+            legacy["full_text"] = long_text[:270] + "…"
+            tweet["note_tweet"] = {
+                "is_expandable": True,
+                "note_tweet_results": {"result": {"text": long_text}},
+            }
+        elif kind == "retweet":
+            original = self.tweet_result(10**17 + index, with_retweet=False)
+            author = original["legacy"]["user_id_str"]
+            legacy["full_text"] = f"RT @{author}: {original['legacy']['full_text']}"
+            original["core"] = self.core(author)
+            legacy["retweeted_status_result"] = {"result": original}
+        elif kind == "quote":
+            quoted = self.tweet_result(2 * 10**17 + index, with_retweet=False)
+            legacy["is_quote_status"] = True
+            legacy["quoted_status_id_str"] = quoted["rest_id"]
+            tweet["quoted_status_result"] = {"result": quoted}
+        elif kind == "media":
+            media = [
+                {
+                    "media_key": f"3_{tweet['rest_id']}{i}",
+                    "media_url_https": f"https://pbs.twimg.com/media/{tweet['rest_id']}{i}.jpg",
+                    "type": self.rng.choice(["photo", "photo", "video", "animated_gif"]),
+                    "sizes": {
+                        "large": {"h": 1080, "w": 1920, "resize": "fit"},
+                        "thumb": {"h": 150, "w": 150, "resize": "crop"},
+                    },
+                }
+                for i in range(self.rng.randint(1, 4))
+            ]
+            legacy["entities"]["media"] = media
+            legacy["extended_entities"] = {"media": media}
+            legacy["possibly_sensitive"] = self.rng.random() < 0.05
+        elif kind == "card":
+            url = f"https://t.co/{self.rng.getrandbits(40):x}"
+            legacy["entities"]["urls"] = [{"url": url, "expanded_url": url}]
+            tweet["card"] = {
+                "rest_id": url,
+                "legacy": {
+                    "name": "summary_large_image",
+                    "url": url,
+                    "binding_values": [
+                        {
+                            "key": "title",
+                            "value": {"type": "STRING", "string_value": self.random_text(6)},
+                        }
+                    ],
+                },
+            }
+
+        tweet["core"] = self.core(legacy["user_id_str"])
+        return tweet
+
+    def tweet_entry(self, index, author_index):
+        rest_id = tweet_id(index)
+        entry = {"entryId": f"tweet-{rest_id}", "content": {}}
+        if self.is_malformed():
+            malformed = self.rng.choice(MALFORMED_TWEET_ENTRIES)
+            if malformed == "tombstone":
+                entry["content"]["itemContent"] = {
+                    "tweet_results": {"result": {"__typename": "TweetTombstone"}}
+                }
+            elif malformed == "missing_legacy":
+                entry["content"]["itemContent"] = {
+                    "tweet_results": {"result": {"rest_id": rest_id}}
+                }
+            return entry
+
+        result = self.rich_tweet_result(index, author_index)
+        if self.rng.random() < 0.05:
+            result = {"__typename": "TweetWithVisibilityResults", "tweet": result}
+        entry["content"] = {
+            "entryType": "TimelineTimelineItem",
+            "itemContent": {
+                "itemType": "TimelineTweet",
+                "tweet_results": {"result": result},
+            },
+        }
+        self.expected["tweets"].add(rest_id)
+        return entry
+
+    def user_tweets_page(self, author_index, first_tweet_index, count=20):
+        entries = [
+            self.tweet_entry(first_tweet_index + i, author_index) for i in range(count)
+        ]
+        entries.append(cursor_entry("top", first_tweet_index))
+        entries.append(cursor_entry("bottom", first_tweet_index + count))
+        instructions = [
+            {"type": "TimelineClearCache"},
+            {"type": "TimelineAddEntries", "entries": entries},
+        ]
+        return {
+            "data": {
+                "user": {
+                    "result": {
+                        "__typename": "User",
+                        "timeline_v2": {"timeline": {"instructions": instructions}},
+                    }
+                }
+            }
+        }
+
+    def user_item(self, index, position):
+        item = {"entryId": f"user-{user_id(index)}-{position}", "item": {}}
+        if self.is_malformed():
+            malformed = self.rng.choice(MALFORMED_USER_ENTRIES)
+            item["item"]["itemContent"] = (
+                {"itemType": "TimelineUser"}
+                if malformed == "missing_user_results"
+                else {"user_results": {"result": {"rest_id": ""}}}
+            )
+            return item
+
+        item["item"]["itemContent"] = {
+            "itemType": "TimelineUser",
+            "user_results": {"result": self.user_result(index)},
+        }
+        self.expected["users"].add(user_id(index))
+        return item
+
+    def connect_tab_page(self, count=20):
+        """
+        Returns a ConnectTabTimeline response recommending `count` users. The recommendations
+        are in the third instruction, where save_users_recommendations_by_ids reads them.
+        """
+        items = [
+            self.user_item(self.random_user_index(), position)
+            for position in range(count)
+        ]
+        entries = [
+            {
+                "entryId": "connect-module-0",
+                "content": {
+                    "entryType": "TimelineTimelineModule",
+                    "items": items,
+                },
+            }
+        ]
+        instructions = [
+            {"type": "TimelineClearCache"},
+            {"type": "TimelineTerminateTimeline", "direction": "Top"},
+            {"type": "TimelineAddEntries", "entries": entries},
+        ]
+        return {"data": {"connect_tab_timeline": {"timeline": {"instructions": instructions}}}}
+
+    def users_by_rest_ids_page(self, count=100):
+        users = []
+        for _ in range(count):
+            index = self.random_user_index()
+            if self.is_malformed():
+                users.append({})
+                continue
+            users.append({"result": self.user_result(index)})
+            self.expected["users"].add(user_id(index))
+        return {"data": {"users": users}}
+
+
+def write_response(directory, params, endpoint, response):
+    path = os.path.join(directory, json.dumps(params, separators=(",", ":")))
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"{time.time_ns()}_{endpoint}.json"), "w") as f:
+        json.dump(response, f)
+
+
+def generate(
+    directory,
+    users_count,
+    user_tweets_pages,
+    connect_tab_pages,
+    users_by_rest_ids_pages,
+    tweets_per_page=20,
+    malformed_rate=0.02,
+    seed=0,
+):
+    generator = PayloadGenerator(users_count, seed=seed, malformed_rate=malformed_rate)
+    for page in range(user_tweets_pages):
+        author_index = generator.random_user_index()
+        response = generator.user_tweets_page(
+            author_index, page * tweets_per_page, tweets_per_page
+        )
+        write_response(directory, {"userId": user_id(author_index)}, "UserTweets", response)
+    for _ in range(connect_tab_pages):
+        context_user_id = int(user_id(generator.random_user_index()))
+        write_response(
+            directory,
+            {"contextualUserId": context_user_id},
+            "ConnectTabTimeline",
+            generator.connect_tab_page(),
+        )
+    for _ in range(users_by_rest_ids_pages):
+        write_response(
+            directory, {}, "UsersByRestIds", generator.users_by_rest_ids_page()
+        )
+    return generator.expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write synthetic GraphQL responses in the archived responses layout."
+    )
+    parser.add_argument("directory", type=str, help="Output directory.")
+    parser.add_argument("--users", type=int, default=1000, help="Population size.")
+    parser.add_argument("--user_tweets_pages", type=int, default=100)
+    parser.add_argument("--connect_tab_pages", type=int, default=20)
+    parser.add_argument("--users_by_rest_ids_pages", type=int, default=10)
+    parser.add_argument("--tweets_per_page", type=int, default=20)
+    parser.add_argument(
+        "--malformed_rate",
+        type=float,
+        default=0.02,
+        help="Share of entries that the parsers must skip.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    expected = generate(
+        args.directory,
+        args.users,
+        args.user_tweets_pages,
+        args.connect_tab_pages,
+        args.users_by_rest_ids_pages,
+        args.tweets_per_page,
+        args.malformed_rate,
+        args.seed,
+    )
+    print(
+        f"Generated {len(expected['tweets'])} tweets, {len(expected['users'])} users "
+        f"and {expected['malformed']} malformed entries in {args.directory}"
+    )
@@ -0,0 +1,314 @@
+"""
+Times the ingestion, scheduling and scoring paths against synthetic data loaded into a
+disposable database on the server configured with DB_HOST / DB_USER / DB_PASSWORD.
+
+    python benchmarks/run_benchmarks.py --tweets 100000 --output results.json
+    python benchmarks/compare.py baseline.json results.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# The scoring module creates its LLM client at import time, it is replaced by a stub below
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import psycopg2
+from benchmarks.synthetic import SyntheticData
+from benchmarks.payloads import PayloadGenerator
+from db.database import create_all_tables
+from utils.config import configure_logging, Config
+from utils.db_utils import (
+    get_db_connection,
+    copy_rows,
+    build_user_params,
+    build_tweet_params,
+    insert_tweets,
+    get_most_mentioned_new_users,
+    USER_COLUMNS,
+    TWEET_COLUMNS,
+)
+from utils.common_utils import save_tweets_to_db, iter_timeline_tweet_results
+from infinite_parse import get_users_to_parse, reset_status, USERS_PER_BATCH
+from process_retweets import fetch_tweets_to_process
+import check_users_in_llm
+
+configure_logging()
+
+LOAD_CHUNK_ROWS = 50000
+INSERT_BATCH_TWEETS = 1000
+SAVE_BATCH_USERS = 25
+SCORED_USERS = 50
+PARSED_PAGES = 200
+
+
+class StubLLMHandler:
+    """
+    Answers every prompt instantly, so that only the prompt assembly is measured.
+    """
+
+    model = "stub"
+
+    def get_response(self, query):
+        return "7"
+
+
+def admin_connection():
+    connection = psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        database=os.getenv("DB_ADMIN_NAME", "postgres"),
+        user=os.getenv("DB_USER", "myuser"),
+        password=os.getenv("DB_PASSWORD", "mypassword"),
+    )
+    connection.autocommit = True
+    return connection
+
+
+def recreate_database(name, drop_only=False):
+    connection = admin_connection()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        if not drop_only:
+            cursor.execute(f"CREATE DATABASE {name}")
+    connection.close()
+
+
+def load_data(db, data, users_count, tweets_count):
+    """
+    Bulk loads the synthetic population and spreads the scheduling columns
+    (scores, parse timestamps) deterministically over the users.
+    """
+    for start in range(0, users_count, LOAD_CHUNK_ROWS):
+        rows = [
+            build_user_params(data.user_result(index))
+            for index in range(start, min(start + LOAD_CHUNK_ROWS, users_count))
+        ]
+        copy_rows(db, "users", USER_COLUMNS, rows)
+        db.connection.commit()
+
+    for start in range(0, tweets_count, LOAD_CHUNK_ROWS):
+        rows = [
+            build_tweet_params(data.tweet_result(index))
+            for index in range(start, min(start + LOAD_CHUNK_ROWS, tweets_count))
+        ]
+        copy_rows(db, "tweets", TWEET_COLUMNS, rows)
+        db.connection.commit()
+        logging.info(f"Loaded {start + len(rows)}/{tweets_count} tweets")
+
+    # users.status is used by the parse scheduler but is not part of create_users_table
+    query = """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'idle';
+        UPDATE users SET
+            status = 'idle',
+            llm_check_score = CASE
+                WHEN abs(hashtext(rest_id)) %% 10 < 4 THEN NULL
+                ELSE abs(hashtext(rest_id)) %% 11
+            END,
+            tweets_parsed = abs(hashtext(rest_id || 'parsed')) %% 3 > 0,
+            tweets_parsed_last_timestamp = %s
+                - INTERVAL '1 minute' * (abs(hashtext(rest_id || 'ts')) %% 86400);
+        ANALYZE;
+    """
+    db.run_query(query, (data.now,))
+
+
+def measure(func, repeat, setup=None, teardown=None):
+    """
+    Runs `func` `repeat` times and returns its timings in seconds.
+    `setup` builds the argument of each run and `teardown` receives its result, neither is timed.
+    """
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        result = func(*args)
+        seconds.append(time.perf_counter() - start)
+        if teardown:
+            teardown(result)
+    return {
+        "seconds": seconds,
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "rows": len(result) if isinstance(result, list) else result,
+    }
+
+
+def run_benchmarks(db, data, tweets_count, repeat):
+    results = {}
+    # Every run inserts tweets that are not in the database yet
+    next_tweet_index = iter(range(tweets_count, 10**12, INSERT_BATCH_TWEETS * 20))
+
+    def tweets_batch():
+        first = next(next_tweet_index)
+        return [
+            data.tweet_result(index) for index in range(first, first + INSERT_BATCH_TWEETS)
+        ]
+
+    def pages_batch():
+        first = next(next_tweet_index)
+        return [
+            data.user_tweets_page(data.random_user_index(), first + i * 20)
+            for i in range(SAVE_BATCH_USERS)
+        ]
+
+    # Parser throughput on realistic pages, without touching the database
+    payloads = PayloadGenerator(data.users_count, seed=data.rng.random())
+
+    def parse_pages(pages):
+        return [
+            build_tweet_params(tweet_results)
+            for page in pages
+            for tweet_results in iter_timeline_tweet_results(page)
+            if "legacy" in tweet_results
+        ]
+
+    results["parse_user_tweets"] = measure(
+        parse_pages,
+        repeat,
+        setup=lambda: [
+            payloads.user_tweets_page(payloads.random_user_index(), i * 20)
+            for i in range(PARSED_PAGES)
+        ],
+    )
+    results["insert_tweets"] = measure(
+        lambda batch: insert_tweets(db, batch), repeat, setup=tweets_batch
+    )
+    results["save_tweets_to_db"] = measure(
+        lambda pages: save_tweets_to_db(db, pages), repeat, setup=pages_batch
+    )
+    results["get_users_to_parse"] = measure(
+        lambda: get_users_to_parse(db, limit_users=USERS_PER_BATCH),
+        repeat,
+        teardown=lambda users: reset_status(db, [user[0] for user in users]),
+    )
+    results["get_most_mentioned_new_users"] = measure(
+        lambda: get_most_mentioned_new_users(db, limit_users=200), repeat
+    )
+    results["fetch_tweets_to_process"] = measure(
+        lambda: fetch_tweets_to_process(db), repeat
+    )
+
+    check_users_in_llm.groq_llm = StubLLMHandler()
+    users = db.run_query(
+        """
+        SELECT rest_id, name, description FROM users
+        WHERE rest_id IN (SELECT user_id FROM tweets GROUP BY user_id HAVING COUNT(*) >= 5)
+        ORDER BY rest_id
+        LIMIT %s;
+        """,
+        (SCORED_USERS,),
+    )
+
+    def score_users():
+        for rest_id, name, description in users:
+            tweets = check_users_in_llm.fetch_latest_tweets_for_user(db, rest_id)
+            check_users_in_llm.analyze_tweets_with_llm(name, description, tweets)
+        return len(users)
+
+    results["llm_prompt_assembly"] = measure(score_users, repeat)
+    return results
+
+
+def get_commit():
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=repo_dir,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=repo_dir,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def main(tweets_count, users_count, repeat, seed, output, keep_database):
+    database = f"benchmark_{os.getpid()}"
+    recreate_database(database)
+    # get_db_connection reads the primary settings on every call, the replica ones from
+    # Config, read queries must not reach a production replica
+    os.environ["DB_NAME"] = database
+    Config.DB_REPLICA_HOST = None
+    data = SyntheticData(users_count, seed=seed)
+
+    try:
+        with get_db_connection() as db:
+            create_all_tables(db)
+            start = time.perf_counter()
+            load_data(db, data, users_count, tweets_count)
+            load_seconds = time.perf_counter() - start
+            results = run_benchmarks(db, data, tweets_count, repeat)
+            server_version = db.run_query("SHOW server_version;")[0][0]
+    finally:
+        if not keep_database:
+            recreate_database(database, drop_only=True)
+
+    report = {
+        "commit": get_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "scale": {"tweets": tweets_count, "users": users_count, "seed": seed},
+        "repeat": repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "db_backend": os.getenv("DB_BACKEND", "psycopg2"),
+        },
+        "load_seconds": load_seconds,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        logging.info(f"{name}: median {result['median'] * 1000:.1f}ms")
+    logging.info(f"Results written to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, scheduling and scoring queries on synthetic data."
+    )
+    parser.add_argument(
+        "--tweets", type=int, default=10000, help="Number of tweets to load."
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=None,
+        help="Number of users to load, defaults to one user per 40 tweets.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of runs of every benchmark."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed.")
+    parser.add_argument(
+        "--output", type=str, default=None, help="Path of the JSON results."
+    )
+    parser.add_argument(
+        "--keep_database",
+        action="store_true",
+        help="Do not drop the benchmark database at the end.",
+    )
+    args = parser.parse_args()
+
+    users_count = args.users or max(args.tweets // 40, 100)
+    output = args.output or f"benchmark-{get_commit() or 'unknown'}-{args.tweets}.json"
+    main(args.tweets, users_count, args.repeat, args.seed, output, args.keep_database)
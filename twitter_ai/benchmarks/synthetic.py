@@ -0,0 +1,155 @@
+import datetime
+import random
+
+TWITTER_DATE_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+SYMBOLS = ["BTC", "ETH", "SOL", "DOGE", "PEPE", "ARB", "OP", "TON", "LINK", "AVAX"]
+WORDS = (
+    "gm wagmi chart pump dump airdrop alpha thread launch mainnet bullish bearish "
+    "liquidity staking yield degen ngmi ser fren rug moon breakout support resistance"
+).split()
+
+# Ids of users that are mentioned in tweets but never inserted into users
+UNKNOWN_USER_ID_OFFSET = 9 * 10**17
+
+
+def format_twitter_date(value):
+    return value.strftime(TWITTER_DATE_FORMAT)
+
+
+def user_id(index):
+    return str(10**15 + index)
+
+
+def user_index(user_id):
+    return int(user_id) - 10**15
+
+
+def tweet_id(index):
+    return str(10**18 + index)
+
+
+class SyntheticData:
+    """
+    Deterministic generator of GraphQL user and tweet results for a population of
+    `users_count` users. Tweet authors follow a power law, so a few users own most tweets,
+    and mentions point both to known users and to ids that are not in the users table.
+    """
+
+    def __init__(self, users_count, seed=0, now=None):
+        self.users_count = users_count
+        self.rng = random.Random(seed)
+        self.now = now or datetime.datetime(2024, 6, 1)
+
+    def random_user_index(self):
+        return min(int(self.rng.paretovariate(1.2)) - 1, self.users_count - 1)
+
+    def random_date(self, max_days=60):
+        return self.now - datetime.timedelta(seconds=self.rng.randint(0, max_days * 86400))
+
+    def random_text(self, words=20):
+        text = " ".join(self.rng.choice(WORDS) for _ in range(words))
+        if self.rng.random() < 0.3:
+            text += f" https://t.co/{self.rng.getrandbits(40):x}"
+        return text
+
+    def user_result(self, index):
+        return {
+            "rest_id": user_id(index),
+            "is_blue_verified": self.rng.random() < 0.2,
+            "legacy": {
+                "screen_name": f"user{index}",
+                "name": f"User {index}",
+                "description": self.random_text(12),
+                "followers_count": self.rng.randint(0, 100000),
+                "friends_count": self.rng.randint(0, 5000),
+                "favourites_count": self.rng.randint(0, 50000),
+                "statuses_count": self.rng.randint(0, 20000),
+                "created_at": format_twitter_date(self.random_date(3000)),
+            },
+            "professional": {},
+        }
+
+    def tweet_result(self, index, author_index=None, with_retweet=None):
+        author_index = (
+            self.random_user_index() if author_index is None else author_index
+        )
+        mentions = [
+            {
+                "id_str": (
+                    user_id(self.random_user_index())
+                    if self.rng.random() < 0.7
+                    else str(UNKNOWN_USER_ID_OFFSET + self.rng.randint(0, 10000))
+                )
+            }
+            for _ in range(self.rng.choice([0, 0, 1, 1, 2, 3]))
+        ]
+        symbols = [
+            {"text": self.rng.choice(SYMBOLS)}
+            for _ in range(self.rng.choice([0, 0, 0, 1, 2]))
+        ]
+        legacy = {
+            "full_text": self.random_text(self.rng.randint(5, 40)),
+            "user_id_str": user_id(author_index),
+            "created_at": format_twitter_date(self.random_date()),
+            "favorite_count": self.rng.randint(0, 500),
+            "retweet_count": self.rng.randint(0, 100),
+            "reply_count": self.rng.randint(0, 50),
+            "quote_count": self.rng.randint(0, 20),
+            "bookmark_count": self.rng.randint(0, 20),
+            "lang": "en",
+            "entities": {"user_mentions": mentions, "symbols": symbols},
+        }
+        if with_retweet is None:
+            with_retweet = self.rng.random() < 0.1
+        if with_retweet:
+            # The retweeted tweet is not inserted, so process_retweets has work to do
+            legacy["retweeted_status_result"] = {
+                "result": {
+                    "rest_id": tweet_id(10**17 + index),
+                    "legacy": {
+                        "full_text": self.random_text(),
+                        "user_id_str": user_id(self.random_user_index()),
+                        "created_at": format_twitter_date(self.random_date()),
+                    },
+                }
+            }
+        return {
+            "rest_id": tweet_id(index),
+            "views": {"count": str(self.rng.randint(0, 100000))},
+            "legacy": legacy,
+        }
+
+    def user_tweets_page(self, author_index, first_tweet_index, count=20):
+        """
+        Returns a UserTweets response holding `count` tweets of one user.
+        """
+        entries = [
+            {
+                "entryId": f"tweet-{tweet_id(first_tweet_index + i)}",
+                "content": {
+                    "itemContent": {
+                        "tweet_results": {
+                            "result": self.tweet_result(
+                                first_tweet_index + i, author_index
+                            )
+                        }
+                    }
+                },
+            }
+            for i in range(count)
+        ]
+        return {
+            "data": {
+                "user": {
+                    "result": {
+                        "timeline_v2": {
+                            "timeline": {
+                                "instructions": [
+                                    {"type": "TimelineAddEntries", "entries": entries}
+                                ]
+                            }
+                        }
+                    }
+                }
+            }
+        }
@@ -2,16 +2,37 @@ import logging
 from utils.db_utils import get_db_connection
 from utils.config import Config, configure_logging
 from utils.common_utils import remove_https_links
+from utils.metrics import timer, inc, observe, start_metrics_server
 from llm.llm_api import GroqAPIHandler
 from datetime import datetime
+import hashlib
 import re
 import time
 
 configure_logging()
 
+# Minimum number of tweets that must arrive after the last LLM check before a user is re-scored
+RESCORE_MIN_NEW_TWEETS = 10
+# Minimum age of an existing score (in seconds) before a user is considered for re-scoring
+RESCORE_MIN_AGE = 7 * 24 * 60 * 60
+RESCORE_BATCH_SIZE = 500
+
 # Initialize Groq LLM
 groq_llm = GroqAPIHandler(Config.GROQ_API_KEY)
 
+# Optional local embedding stage that scores clear-cut users without calling the LLM
+embedding_prefilter = None
+if Config.EMBEDDING_PREFILTER:
+    from llm.embedding_filter import EmbeddingPreFilter
+
+    embedding_prefilter = EmbeddingPreFilter(
+        model=Config.EMBEDDING_MODEL,
+        negative_threshold=Config.EMBEDDING_NEGATIVE_THRESHOLD,
+        positive_threshold=Config.EMBEDDING_POSITIVE_THRESHOLD,
+        negative_score=Config.EMBEDDING_NEGATIVE_SCORE,
+        positive_score=Config.EMBEDDING_POSITIVE_SCORE,
+    )
+
 # Define the prompt for Groq LLM
 prompt_template = """
 YOU ARE AN ADVANCED LANGUAGE MODEL, TASKED WITH ANALYZING IF THE FOLLOWING TWEETS ARE ABOUT CRYPTOCURRENCY. 
@@ -27,24 +48,75 @@ GIVE ME ONLY ONE NUMBER COMBINED BASED ON ALL TWEETS YOU JUST READ AND I WILL TI
 """
 
 
+@timer("db_query_seconds", query="fetch_users_from_db")
 def fetch_users_from_db():
     query = """
-        SELECT u.rest_id, u.name, u.description 
+        SELECT u.rest_id, u.name, u.description, u.llm_check_fingerprint
         FROM users u
-        JOIN tweets t ON u.rest_id = t.user_id
         WHERE u.llm_check_score IS NULL
-        GROUP BY u.rest_id, u.name, u.description
-        HAVING COUNT(t.tweet_id) >= 5;
+        AND (
+            SELECT SUM(a.tweets) FROM user_daily_activity a WHERE a.user_id = u.rest_id
+        ) >= 5;
     """
-    with get_db_connection() as db:
+    with get_db_connection(role="read") as db:
         return db.run_query(query)
 
 
+@timer("db_query_seconds", query="fetch_users_to_rescore")
+def fetch_users_to_rescore(
+    min_new_tweets=RESCORE_MIN_NEW_TWEETS,
+    min_age=RESCORE_MIN_AGE,
+    limit=RESCORE_BATCH_SIZE,
+):
+    """
+    Selects already scored users that received at least `min_new_tweets` tweets since their last LLM check.
+
+    The candidate set is driven by the partial index on users(llm_check_last_timestamp) and the
+    new tweets are counted with a bounded probe of the tweets(user_id, created_date) index, so
+    no full join between users and tweets is performed.
+    """
+    query = """
+        SELECT u.rest_id, u.name, u.description, u.llm_check_fingerprint
+        FROM users u
+        WHERE u.llm_check_score IS NOT NULL
+        AND u.llm_check_last_timestamp < NOW() - INTERVAL '1 second' * %s
+        AND (
+            SELECT COUNT(*)
+            FROM (
+                SELECT 1
+                FROM tweets t
+                WHERE t.user_id = u.rest_id
+                AND t.created_date > u.llm_check_last_timestamp
+                LIMIT %s
+            ) AS new_tweets
+        ) >= %s
+        ORDER BY u.llm_check_last_timestamp
+        LIMIT %s;
+    """
+    with get_db_connection(role="read") as db:
+        return db.run_query(query, (min_age, min_new_tweets, min_new_tweets, limit))
+
+
+def get_tweets_fingerprint(tweets):
+    """
+    Returns an md5 fingerprint of the set of tweet ids used to compute a score.
+    """
+    tweet_ids = sorted(tweet[1] for tweet in tweets)
+    return hashlib.md5(",".join(tweet_ids).encode("utf-8")).hexdigest()
+
+
+@timer("db_query_seconds", query="fetch_latest_tweets_for_user")
 def fetch_latest_tweets_for_user(db, user_id, limit=20):
+    # One tweet per near-duplicate cluster, copy-paste shilling would crowd out the rest
     query = """
-        SELECT tweet_text 
-        FROM tweets
-        WHERE user_id = %s
+        SELECT tweet_text, tweet_id
+        FROM (
+            SELECT DISTINCT ON (COALESCE(dup_cluster_id, tweet_id))
+                tweet_text, tweet_id, created_at
+            FROM tweets
+            WHERE user_id = %s
+            ORDER BY COALESCE(dup_cluster_id, tweet_id), created_at DESC
+        ) AS representatives
         ORDER BY created_at DESC
         LIMIT %s;
     """
@@ -63,7 +135,8 @@ def analyze_tweets_with_llm(username, bio, tweets, max_retries=5, backoff_factor
 
     while retries < max_retries:
         try:
-            response = groq_llm.get_response(prompt)
+            with timer("llm_request_seconds", provider="groq", model=groq_llm.model):
+                response = groq_llm.get_response(prompt)
             if isinstance(response, dict) and (
                 response.get("error")
                 in ["rate_limit_exceeded", "context_length_exceeded"]
@@ -110,29 +183,50 @@ def analyze_tweets_with_llm(username, bio, tweets, max_retries=5, backoff_factor
     return score
 
 
-def update_llm_check_score(db, user_id, score):
+def update_llm_check_score(db, user_id, score, fingerprint=None, source="llm"):
+    """
+    Stores a score with its source, "llm" or "embedding" for the scores of the local
+    pre-filter, so that those can be told apart and re-scored after a recalibration.
+    """
     query = """
         UPDATE users
-        SET llm_check_score = %s, llm_check_last_timestamp = %s
+        SET llm_check_score = %s, llm_check_last_timestamp = %s, llm_check_fingerprint = %s,
+            llm_check_source = %s
         WHERE rest_id = %s;
     """
-    params = (score, datetime.utcnow(), user_id)
+    params = (score, datetime.utcnow(), fingerprint, source, user_id)
     db.run_query(query, params)
 
 
+def touch_llm_check_timestamp(db, user_id):
+    query = """
+        UPDATE users
+        SET llm_check_last_timestamp = %s
+        WHERE rest_id = %s;
+    """
+    db.run_query(query, (datetime.utcnow(), user_id))
+
+
 def main():
+    start_metrics_server(Config.METRICS_PORT)
     with get_db_connection() as db:
         while True:
+            cycle_start = time.perf_counter()
             try:
                 logging.info("Fetching users from the database")
                 users = fetch_users_from_db()
+                rescore_users = fetch_users_to_rescore()
+                logging.info(
+                    f"Found {len(users)} unscored users and {len(rescore_users)} users to re-score"
+                )
+                users = users + rescore_users
                 if not users:
                     logging.info("No users found needing LLM check")
                     time.sleep(300)
                     continue
 
                 for user in users:
-                    user_id, username, bio = user
+                    user_id, username, bio, previous_fingerprint = user
                     logging.info(f"Processing user: {user_id}")
 
                     tweets = fetch_latest_tweets_for_user(db, user_id)
@@ -140,16 +234,44 @@ def main():
                         logging.info(f"No tweets found for user: {user_id}")
                         continue
 
+                    fingerprint = get_tweets_fingerprint(tweets)
+                    if fingerprint == previous_fingerprint:
+                        logging.info(
+                            f"Tweets used for the score of user {user_id} did not change, skipping"
+                        )
+                        touch_llm_check_timestamp(db, user_id)
+                        inc("cache_hits_total", cache="llm_check_fingerprint")
+                        continue
+                    inc("cache_misses_total", cache="llm_check_fingerprint")
+
+                    if embedding_prefilter:
+                        local_score = embedding_prefilter.score_user(
+                            db, user_id, bio, tweets
+                        )
+                        if local_score is not None:
+                            update_llm_check_score(
+                                db, user_id, local_score, fingerprint, "embedding"
+                            )
+                            inc("cache_hits_total", cache="embedding_prefilter")
+                            logging.info(
+                                f"Scored user {user_id} locally, skipping LLM call"
+                            )
+                            continue
+                        inc("cache_misses_total", cache="embedding_prefilter")
+
                     try:
                         score = analyze_tweets_with_llm(username, bio, tweets)
                         logging.info(f"User {user_id} LLM check score: {score}")
-                        update_llm_check_score(db, user_id, score)
+                        update_llm_check_score(db, user_id, score, fingerprint)
                         logging.info(f"Updated LLM check score for user: {user_id}")
                     except Exception as e:
                         logging.error(
                             f"Failed to analyze tweets for user {user_id}: {e}"
                         )
 
+                observe(
+                    "cycle_seconds", time.perf_counter() - cycle_start, worker="llm_check"
+                )
                 logging.info("Sleeping for 5 minutes before next cycle")
                 time.sleep(300)  # Sleep for 5 minutes before checking again
 
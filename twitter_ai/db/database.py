@@ -1,7 +1,16 @@
+import datetime
+import logging
+import re
+import time
+from contextlib import contextmanager
 import psycopg2
+from db.query_stats import get_query_stats
 
 
 class Database:
+    # Named queries that are prepared on the server the first time a connection runs them
+    prepared_queries = {}
+
     def __init__(self, host, database, user, password):
         self.conn_params = {
             "host": host,
@@ -11,11 +20,23 @@ class Database:
         }
         self.connection = None
         self.cursor = None
+        self.prepared = set()
+        self.prepared_stats = {}
+        self.in_pipeline = False
+        self.commit_callbacks = []
+
+    @classmethod
+    def register_prepared(cls, name, query):
+        """
+        Registers a query written with %s placeholders under a name usable with run_prepared.
+        """
+        cls.prepared_queries[name] = query
 
     def __enter__(self):
         try:
             self.connection = psycopg2.connect(**self.conn_params)
             self.cursor = self.connection.cursor()
+            self.prepared = set()
         except psycopg2.Error as e:
             print(f"Error connecting to the database: {e}")
             self.connection = None
@@ -37,20 +58,39 @@ class Database:
             raise AttributeError(
                 "Cursor is not initialized. Check the database connection."
             )
+        start = time.perf_counter()
         self.cursor.execute(query, params or ())
-        self.connection.commit()  # Ensure that changes are committed
+        self._commit()  # Ensure that changes are committed
         try:
-            return self.cursor.fetchall()
+            rows = self.cursor.fetchall()
         except psycopg2.ProgrammingError:
-            return None
+            rows = None
+        self._record_query(query, params, start)
+        return rows
+
+    def execute(self, query, params=None):
+        """
+        Runs a statement whose result is not needed. Inside pipeline() it is committed
+        with the block instead of on its own.
+        """
+        if self.cursor is None:
+            raise AttributeError(
+                "Cursor is not initialized. Check the database connection."
+            )
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        self._commit()
+        self._record_query(query, params, start)
 
     def run_batch_query(self, query, params_list):
         if self.cursor is None:
             raise AttributeError(
                 "Cursor is not initialized. Check the database connection."
             )
+        start = time.perf_counter()
         self.cursor.executemany(query, params_list)
-        self.connection.commit()  # Ensure that changes are committed
+        self._commit()  # Ensure that changes are committed
+        self._record_query(query, params_list, start)
 
         return self.cursor.rowcount
 
@@ -61,10 +101,125 @@ class Database:
             raise AttributeError(
                 "Cursor is not initialized. Check the database connection."
             )
+        start = time.perf_counter()
         self.cursor.executemany(query, params_list)
-        self.connection.commit()
+        self._commit()
+        self._record_query(query, params_list, start)
         return self.cursor.rowcount
 
+    def _prepare(self, name):
+        query = self.prepared_queries[name].strip().rstrip(";")
+        counter = iter(range(1, query.count("%s") + 1))
+        query = re.sub(r"%s", lambda _: f"${next(counter)}", query)
+        self.cursor.execute(f"PREPARE {name} AS {query}")
+        self.prepared.add(name)
+        self.prepared_stats.setdefault(name, {"calls": 0, "rows": 0, "seconds": 0.0})
+
+    def run_prepared(self, name, params_list, returning=False):
+        """
+        Executes a registered query once per params tuple through a server-side prepared
+        statement, so the server parses and plans it only once per connection.
+
+        Returns:
+            int: The number of affected rows, or with `returning` the list of rows
+            returned by all executions.
+        """
+        if not isinstance(params_list, list):
+            params_list = [params_list]
+        if self.cursor is None:
+            raise AttributeError(
+                "Cursor is not initialized. Check the database connection."
+            )
+        if name not in self.prepared:
+            self._prepare(name)
+
+        start = time.perf_counter()
+        rowcount = 0
+        rows = []
+        for params in params_list:
+            placeholders = ", ".join(["%s"] * len(params))
+            self.cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+            rowcount += max(self.cursor.rowcount, 0)
+            if returning:
+                rows.extend(self.cursor.fetchall())
+        self._commit()
+
+        stats = self.prepared_stats[name]
+        stats["calls"] += len(params_list)
+        stats["rows"] += rowcount
+        stats["seconds"] += time.perf_counter() - start
+        self._record_query(self.prepared_queries[name], params_list, start, rowcount)
+        return rows if returning else rowcount
+
+    def _commit(self):
+        if not self.in_pipeline:
+            self.connection.commit()
+
+    def after_commit(self, callback):
+        """
+        Runs `callback` once the statements issued so far are committed: right away outside
+        pipeline(), when the block commits inside it. Callbacks of a block that is rolled
+        back are dropped.
+        """
+        if self.in_pipeline:
+            self.commit_callbacks.append(callback)
+        else:
+            callback()
+
+    def _run_commit_callbacks(self):
+        callbacks, self.commit_callbacks = self.commit_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def pipeline(self):
+        """
+        Runs the statements of the block in a single transaction committed when it exits,
+        or rolled back if it raises. psycopg2 has no pipeline mode, every statement still
+        waits for its result, but the block saves the commit of each one.
+        """
+        if self.cursor is None:
+            raise AttributeError(
+                "Cursor is not initialized. Check the database connection."
+            )
+        self.in_pipeline = True
+        try:
+            yield self
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            self.commit_callbacks = []
+            raise
+        finally:
+            self.in_pipeline = False
+        self._run_commit_callbacks()
+
+    def _record_query(self, query, params, start, rowcount=None):
+        query_stats = get_query_stats()
+        if query_stats is None:
+            return
+        query_stats.record(
+            query,
+            params,
+            time.perf_counter() - start,
+            self.cursor.rowcount if rowcount is None else rowcount,
+            self._explain,
+        )
+
+    def _explain(self, query, params):
+        if self.in_pipeline:
+            # The rollback below would discard the uncommitted statements of the block
+            return None
+        # Batches are explained with the parameters of their first row
+        if isinstance(params, list) and params and isinstance(params[0], (tuple, list)):
+            params = params[0]
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {query}", params or ())
+                return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            self.connection.rollback()
+
     def close(self):
         if self.cursor:
             self.cursor.close()
@@ -72,6 +227,51 @@ class Database:
             self.connection.close()
 
 
+class ReplicaMixin:
+    """
+    Read-only connection to a replica that falls back to the primary when the replica
+    is unreachable or lags behind by more than `max_lag` seconds.
+    """
+
+    LAG_QUERY = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END;
+    """
+
+    def __init__(self, host, database, user, password, primary_params, max_lag=30):
+        super().__init__(host, database, user, password)
+        self.primary_params = primary_params
+        self.max_lag = max_lag
+        self.is_replica = True
+
+    def replication_lag(self):
+        self.cursor.execute(self.LAG_QUERY)
+        return float(self.cursor.fetchone()[0])
+
+    def __enter__(self):
+        super().__enter__()
+        if self.cursor is not None:
+            try:
+                lag = self.replication_lag()
+                if lag <= self.max_lag:
+                    return self
+                print(f"Replica lag {lag:.1f}s exceeds {self.max_lag}s, using primary")
+            except Exception as e:
+                print(f"Error checking replica lag: {e}")
+            self.close()
+
+        self.conn_params = dict(self.primary_params)
+        self.is_replica = False
+        return super().__enter__()
+
+
+class ReplicaDatabase(ReplicaMixin, Database):
+    pass
+
+
 def create_users_table(db):
     query = """
         CREATE TABLE IF NOT EXISTS users (
@@ -99,8 +299,15 @@ def create_users_table(db):
             recommendations_pulled BOOLEAN DEFAULT FALSE,
             recommendations_pulled_last_timestamp TIMESTAMP DEFAULT NULL,
             llm_check_score FLOAT DEFAULT NULL,
-            llm_check_last_timestamp TIMESTAMP DEFAULT NULL
+            llm_check_last_timestamp TIMESTAMP DEFAULT NULL,
+            llm_check_fingerprint VARCHAR(32) DEFAULT NULL,
+            llm_check_source VARCHAR(32) DEFAULT NULL
         );
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS llm_check_fingerprint VARCHAR(32) DEFAULT NULL;
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS llm_check_source VARCHAR(32) DEFAULT NULL;
+        CREATE INDEX IF NOT EXISTS users_lastmodified_idx ON users(lastmodified);
+        CREATE INDEX IF NOT EXISTS users_llm_check_last_timestamp_idx
+            ON users(llm_check_last_timestamp) WHERE llm_check_score IS NOT NULL;
     """
     db.run_query(query)
 
@@ -137,6 +344,72 @@ def create_tweets_table(db):
             created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             lastmodified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS tweets_user_id_created_date_idx ON tweets(user_id, created_date);
+        CREATE INDEX IF NOT EXISTS tweets_lastmodified_idx ON tweets(lastmodified);
+        CREATE INDEX IF NOT EXISTS tweets_created_at_idx ON tweets(created_at);
+    """
+    db.run_query(query)
+
+
+def create_tweet_clean_text(db):
+    """
+    Tweet text without links, mentions, cashtags and hashtags, computed at ingestion by
+    utils.text_utils.clean_tweet_text. Rows stored before the columns existed are filled
+    in batches by backfill_clean_text.py.
+    """
+    query = """
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS clean_text TEXT;
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS clean_text_length INTEGER;
+    """
+    db.run_query(query)
+
+
+def create_tweet_search_index(db):
+    """
+    Full-text search over tweet_text. The tsvector is a stored generated column, so
+    Postgres recomputes it whenever an upsert or COPY writes the text.
+    """
+    query = """
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS tweet_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', COALESCE(tweet_text, ''))) STORED;
+        CREATE INDEX IF NOT EXISTS tweets_tweet_tsv_idx ON tweets USING GIN (tweet_tsv);
+    """
+    db.run_query(query)
+
+
+def create_tweet_dup_clusters(db):
+    """
+    Near-duplicate clusters of tweets. The ingestion stores a MinHash signature and its LSH
+    band keys with every tweet; when a new tweet is inserted it joins the cluster of any
+    stored tweet that shares a band key, otherwise it starts its own cluster.
+    """
+    query = """
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS minhash BYTEA;
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS lsh_bands BIGINT[];
+        ALTER TABLE tweets ADD COLUMN IF NOT EXISTS dup_cluster_id VARCHAR(255);
+        CREATE INDEX IF NOT EXISTS tweets_lsh_bands_idx ON tweets USING GIN (lsh_bands);
+
+        CREATE OR REPLACE FUNCTION assign_dup_cluster() RETURNS trigger AS $$
+        BEGIN
+            -- Re-crawled tweets keep their cluster, ON CONFLICT does not update it
+            IF NEW.dup_cluster_id IS NULL
+                AND NEW.lsh_bands IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM tweets WHERE tweet_id = NEW.tweet_id)
+            THEN
+                SELECT dup_cluster_id INTO NEW.dup_cluster_id
+                FROM tweets
+                WHERE lsh_bands && NEW.lsh_bands AND dup_cluster_id IS NOT NULL
+                LIMIT 1;
+            END IF;
+            NEW.dup_cluster_id := COALESCE(NEW.dup_cluster_id, NEW.tweet_id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS tweets_dup_cluster ON tweets;
+        CREATE TRIGGER tweets_dup_cluster
+            BEFORE INSERT ON tweets
+            FOR EACH ROW EXECUTE FUNCTION assign_dup_cluster();
     """
     db.run_query(query)
 
@@ -146,10 +419,13 @@ def create_user_recommendations_table(db):
         CREATE TABLE IF NOT EXISTS user_recommendations (
             rest_id VARCHAR(255) NOT NULL,
             recommended_user_id VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (rest_id, recommended_user_id),
             FOREIGN KEY (rest_id) REFERENCES users(rest_id) ON DELETE CASCADE,
             FOREIGN KEY (recommended_user_id) REFERENCES users(rest_id) ON DELETE CASCADE
         );
+        ALTER TABLE user_recommendations ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+        CREATE INDEX IF NOT EXISTS user_recommendations_created_at_idx ON user_recommendations(created_at);
     """
     db.run_query(query)
 
@@ -170,6 +446,7 @@ def create_actions_table(db):
             FOREIGN KEY (target_tweet_id) REFERENCES tweets(tweet_id) ON DELETE CASCADE,
             FOREIGN KEY (target_user_id) REFERENCES users(rest_id) ON DELETE CASCADE
         );
+        CREATE INDEX IF NOT EXISTS actions_created_at_idx ON actions(created_at);
     """
     db.run_query(query)
 
@@ -194,17 +471,476 @@ def create_proxies_table(db):
     db.run_query(query)
 
 
+def create_user_embeddings_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS user_embeddings (
+            rest_id VARCHAR(255) PRIMARY KEY REFERENCES users(rest_id) ON DELETE CASCADE,
+            model VARCHAR(255) NOT NULL,
+            embedding REAL[] NOT NULL,
+            topic_similarity FLOAT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """
+    db.run_query(query)
+
+
+def create_user_features_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS user_features (
+            rest_id VARCHAR(255) PRIMARY KEY,
+            follow_ratio FLOAT,
+            recent_tweet_count INTEGER,
+            tweet_interval FLOAT,
+            tweets_48h INTEGER,
+            avg_views FLOAT,
+            avg_likes FLOAT,
+            last_tweet_at TIMESTAMP,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """
+    db.run_query(query)
+
+
+def create_user_graph_metrics_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS user_graph_metrics (
+            rest_id VARCHAR(255) PRIMARY KEY,
+            pagerank FLOAT,
+            in_degree INTEGER,
+            out_degree INTEGER,
+            component_id VARCHAR(255),
+            component_size INTEGER,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS user_graph_metrics_pagerank_idx
+            ON user_graph_metrics(pagerank DESC);
+    """
+    db.run_query(query)
+
+
+def create_raw_responses_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS raw_responses (
+            content_hash CHAR(64) PRIMARY KEY,
+            endpoint VARCHAR(64) NOT NULL,
+            user_id VARCHAR(255),
+            fetched_at TIMESTAMP NOT NULL,
+            segment VARCHAR(255) NOT NULL,
+            segment_offset BIGINT NOT NULL,
+            length INTEGER NOT NULL,
+            raw_size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS raw_responses_endpoint_user_fetched_idx
+            ON raw_responses(endpoint, user_id, fetched_at);
+    """
+    db.run_query(query)
+
+
+TWEET_METRIC_COLUMNS = ["likes", "retweets", "replies", "quotes", "bookmarks", "views"]
+
+
+def create_tweet_metrics_history_table(db):
+    """
+    Append-only history of the engagement counters of tweets, partitioned by month.
+
+    Rows are written by triggers on tweets: one when a tweet is inserted and one each time
+    an update changes at least one counter, so re-crawls that see the same numbers add nothing.
+    """
+    columns = ", ".join(TWEET_METRIC_COLUMNS)
+    old_values = ", ".join(f"OLD.{column}" for column in TWEET_METRIC_COLUMNS)
+    new_values = ", ".join(f"NEW.{column}" for column in TWEET_METRIC_COLUMNS)
+    query = f"""
+        CREATE TABLE IF NOT EXISTS tweet_metrics_history (
+            tweet_id VARCHAR(255) NOT NULL,
+            recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            likes INTEGER,
+            retweets INTEGER,
+            replies INTEGER,
+            quotes INTEGER,
+            bookmarks INTEGER,
+            views INTEGER
+        ) PARTITION BY RANGE (recorded_at);
+        CREATE TABLE IF NOT EXISTS tweet_metrics_history_default
+            PARTITION OF tweet_metrics_history DEFAULT;
+        CREATE INDEX IF NOT EXISTS tweet_metrics_history_tweet_id_recorded_at_idx
+            ON tweet_metrics_history(tweet_id, recorded_at);
+
+        CREATE OR REPLACE FUNCTION record_tweet_metrics() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tweet_metrics_history (tweet_id, {columns})
+            VALUES (NEW.tweet_id, {new_values});
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS tweets_metrics_history_insert ON tweets;
+        CREATE TRIGGER tweets_metrics_history_insert
+            AFTER INSERT ON tweets
+            FOR EACH ROW EXECUTE FUNCTION record_tweet_metrics();
+        DROP TRIGGER IF EXISTS tweets_metrics_history_update ON tweets;
+        CREATE TRIGGER tweets_metrics_history_update
+            AFTER UPDATE ON tweets
+            FOR EACH ROW
+            WHEN (({old_values}) IS DISTINCT FROM ({new_values}))
+            EXECUTE FUNCTION record_tweet_metrics();
+    """
+    db.run_query(query)
+    create_tweet_metrics_partitions(db)
+
+
+def create_tweet_metrics_partitions(db, months_ahead=2, start=None):
+    """
+    Creates the monthly partitions of tweet_metrics_history from the month of `start` (today
+    by default) up to `months_ahead` months later. Rows outside of them land in the default
+    partition, so long running workers call maintain_tweet_metrics_partitions every cycle.
+    """
+    month = (start or datetime.date.today()).replace(day=1)
+    for _ in range(months_ahead + 1):
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        query = f"""
+            CREATE TABLE IF NOT EXISTS tweet_metrics_history_{month:%Y_%m}
+                PARTITION OF tweet_metrics_history
+                FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}');
+        """
+        try:
+            db.run_query(query)
+        except Exception as e:
+            # Fails when the default partition already holds rows of that month
+            db.connection.rollback()
+            logging.warning(
+                f"Moving the rows of {month} out of the default partition of "
+                f"tweet_metrics_history: {e}"
+            )
+            try:
+                create_tweet_metrics_partition_from_default(db, month, next_month)
+            except Exception as e:
+                db.connection.rollback()
+                logging.error(
+                    f"Error creating tweet_metrics_history partition for {month}: {e}"
+                )
+                raise
+        month = next_month
+
+
+def create_tweet_metrics_partition_from_default(db, month, next_month):
+    """
+    Creates the partition of a month whose rows already landed in the default partition:
+    the default partition is detached, its rows of the month are moved to the new partition
+    and it is attached again. Everything runs in one transaction, the lock taken by the
+    detach holds back the triggers writing history until it commits.
+    """
+    query = f"""
+        ALTER TABLE tweet_metrics_history DETACH PARTITION tweet_metrics_history_default;
+        CREATE TABLE IF NOT EXISTS tweet_metrics_history_{month:%Y_%m}
+            PARTITION OF tweet_metrics_history
+            FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}');
+        WITH moved AS (
+            DELETE FROM tweet_metrics_history_default
+            WHERE recorded_at >= '{month:%Y-%m-%d}' AND recorded_at < '{next_month:%Y-%m-%d}'
+            RETURNING *
+        )
+        INSERT INTO tweet_metrics_history SELECT * FROM moved;
+        ALTER TABLE tweet_metrics_history
+            ATTACH PARTITION tweet_metrics_history_default DEFAULT;
+    """
+    db.run_query(query)
+
+
+_partitions_checked_on = None
+
+
+def maintain_tweet_metrics_partitions(db, months_ahead=2):
+    """
+    Runs create_tweet_metrics_partitions at most once a day, so the loops of long running
+    workers keep creating the partitions of the upcoming months before they start. A
+    failure does not stop the worker, it is logged and retried on every call until the
+    partitions are created.
+    """
+    global _partitions_checked_on
+    today = datetime.date.today()
+    if _partitions_checked_on != today:
+        try:
+            create_tweet_metrics_partitions(db, months_ahead)
+        except Exception:
+            return
+        _partitions_checked_on = today
+
+
+USER_SNAPSHOT_COLUMNS = [
+    "username",
+    "name",
+    "profile_image_url_https",
+    "profile_banner_url",
+    "description",
+    "location",
+    "followers_count",
+    "friends_count",
+    "favourites_count",
+    "statuses_count",
+    "is_blue_verified",
+    "is_translator",
+    "verified",
+    "professional_type",
+    "category",
+]
+
+
+def create_user_snapshots_table(db):
+    """
+    History of user profiles where every row holds only the columns that changed.
+
+    A trigger on users stores the full profile when a user is inserted and, on updates, a
+    JSONB object with the new values of the changed columns. Users that existed before the
+    table get their current profile as initial snapshot.
+    """
+    profile = ", ".join(f"'{column}', NEW.{column}" for column in USER_SNAPSHOT_COLUMNS)
+    old_values = ", ".join(f"OLD.{column}" for column in USER_SNAPSHOT_COLUMNS)
+    new_values = ", ".join(f"NEW.{column}" for column in USER_SNAPSHOT_COLUMNS)
+    query = f"""
+        CREATE TABLE IF NOT EXISTS user_snapshots (
+            rest_id VARCHAR(255) NOT NULL,
+            recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            changes JSONB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS user_snapshots_rest_id_recorded_at_idx
+            ON user_snapshots(rest_id, recorded_at);
+
+        CREATE OR REPLACE FUNCTION record_user_snapshot() RETURNS trigger AS $$
+        DECLARE
+            profile JSONB := jsonb_build_object({profile});
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                SELECT jsonb_object_agg(new_values.key, new_values.value)
+                INTO profile
+                FROM jsonb_each(profile) AS new_values
+                WHERE to_jsonb(OLD) -> new_values.key IS DISTINCT FROM new_values.value;
+            END IF;
+            INSERT INTO user_snapshots (rest_id, changes) VALUES (NEW.rest_id, profile);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS users_snapshots_insert ON users;
+        CREATE TRIGGER users_snapshots_insert
+            AFTER INSERT ON users
+            FOR EACH ROW EXECUTE FUNCTION record_user_snapshot();
+        DROP TRIGGER IF EXISTS users_snapshots_update ON users;
+        CREATE TRIGGER users_snapshots_update
+            AFTER UPDATE ON users
+            FOR EACH ROW
+            WHEN (({old_values}) IS DISTINCT FROM ({new_values}))
+            EXECUTE FUNCTION record_user_snapshot();
+
+        INSERT INTO user_snapshots (rest_id, recorded_at, changes)
+        SELECT
+            u.rest_id,
+            COALESCE(u.lastmodified, u.created_date, CURRENT_TIMESTAMP),
+            jsonb_build_object({profile.replace("NEW.", "u.")})
+        FROM users u
+        WHERE NOT EXISTS (SELECT 1 FROM user_snapshots s WHERE s.rest_id = u.rest_id);
+    """
+    db.run_query(query)
+
+
+def create_rollup_watermarks_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name VARCHAR(64) PRIMARY KEY,
+            watermark TIMESTAMP NOT NULL
+        );
+    """
+    db.run_query(query)
+
+
+def create_symbol_hourly_table(db):
+    query = """
+        CREATE TABLE IF NOT EXISTS symbol_hourly (
+            symbol VARCHAR(64) NOT NULL,
+            hour TIMESTAMP NOT NULL,
+            tweet_count INTEGER NOT NULL,
+            unique_users INTEGER NOT NULL,
+            sum_views BIGINT NOT NULL,
+            sum_likes BIGINT NOT NULL,
+            PRIMARY KEY (symbol, hour)
+        );
+        CREATE INDEX IF NOT EXISTS symbol_hourly_hour_idx ON symbol_hourly(hour);
+    """
+    db.run_query(query)
+
+
+def create_user_daily_activity_table(db):
+    """
+    Number of tweets, views and likes of every user per day of tweets.created_at.
+
+    Statement level triggers on tweets add the difference between the new and the old rows
+    of every write, so batches and COPY update each (user_id, day) once. The table is
+    filled from the existing tweets when it is empty.
+    """
+
+    def apply_deltas(rows):
+        return f"""
+            INSERT INTO user_daily_activity AS a (user_id, day, tweets, views, likes)
+            SELECT user_id, day, SUM(tweets), SUM(views), SUM(likes)
+            FROM ({rows}) AS deltas
+            WHERE user_id IS NOT NULL AND day IS NOT NULL
+            GROUP BY user_id, day
+            HAVING (SUM(tweets), SUM(views), SUM(likes)) <> (0, 0, 0)
+            ORDER BY user_id, day
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                tweets = a.tweets + EXCLUDED.tweets,
+                views = a.views + EXCLUDED.views,
+                likes = a.likes + EXCLUDED.likes;
+        """
+
+    def rows_of(table, sign):
+        return f"""
+            SELECT
+                user_id,
+                created_at::date AS day,
+                {sign}1 AS tweets,
+                {sign}COALESCE(views, 0)::bigint AS views,
+                {sign}COALESCE(likes, 0)::bigint AS likes
+            FROM {table}
+        """
+
+    query = f"""
+        CREATE TABLE IF NOT EXISTS user_daily_activity (
+            user_id VARCHAR(255) NOT NULL,
+            day DATE NOT NULL,
+            tweets INTEGER NOT NULL,
+            views BIGINT NOT NULL,
+            likes BIGINT NOT NULL,
+            PRIMARY KEY (user_id, day)
+        );
+        CREATE INDEX IF NOT EXISTS user_daily_activity_day_idx ON user_daily_activity(day);
+
+        CREATE OR REPLACE FUNCTION record_user_daily_activity() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {apply_deltas(rows_of("new_rows", ""))}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {apply_deltas(rows_of("new_rows", "") + " UNION ALL " + rows_of("old_rows", "-"))}
+            ELSE
+                {apply_deltas(rows_of("old_rows", "-"))}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS tweets_daily_activity_insert ON tweets;
+        CREATE TRIGGER tweets_daily_activity_insert
+            AFTER INSERT ON tweets
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION record_user_daily_activity();
+        DROP TRIGGER IF EXISTS tweets_daily_activity_update ON tweets;
+        CREATE TRIGGER tweets_daily_activity_update
+            AFTER UPDATE ON tweets
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION record_user_daily_activity();
+        DROP TRIGGER IF EXISTS tweets_daily_activity_delete ON tweets;
+        CREATE TRIGGER tweets_daily_activity_delete
+            AFTER DELETE ON tweets
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION record_user_daily_activity();
+
+        INSERT INTO user_daily_activity (user_id, day, tweets, views, likes)
+        SELECT
+            user_id,
+            created_at::date,
+            COUNT(*),
+            COALESCE(SUM(views), 0),
+            COALESCE(SUM(likes), 0)
+        FROM tweets
+        WHERE user_id IS NOT NULL AND created_at IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM user_daily_activity)
+        GROUP BY user_id, created_at::date;
+    """
+    db.run_query(query)
+
+
+# Columns whose changes alone do not bump lastmodified, like the worker status of users.
+# Generated columns are left out as well, they are not computed yet in BEFORE triggers.
+LASTMODIFIED_IGNORED_COLUMNS = {
+    "users": ("lastmodified", "status"),
+    "tweets": ("lastmodified",),
+}
+
+
+def create_lastmodified_triggers(db):
+    """
+    Bumps lastmodified on every update of users and tweets that changes a column, also
+    for the updates that do not set it themselves (scores, parse flags, backfills), so
+    that exports and rollups watermarked on lastmodified see them.
+
+    The trigger compares the columns that exist when it is created, it is regenerated by
+    create_all_tables, so columns added later must be added before this call.
+    """
+    columns_query = """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position;
+    """
+    for table, ignored_columns in LASTMODIFIED_IGNORED_COLUMNS.items():
+        columns = [
+            row[0]
+            for row in db.run_query(columns_query, (table,))
+            if row[0] not in ignored_columns
+        ]
+        new_row = ", ".join(f"NEW.{column}" for column in columns)
+        old_row = ", ".join(f"OLD.{column}" for column in columns)
+        query = f"""
+            CREATE OR REPLACE FUNCTION touch_{table}_lastmodified() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.lastmodified IS NOT DISTINCT FROM OLD.lastmodified
+                    AND ROW({new_row}) IS DISTINCT FROM ROW({old_row})
+                THEN
+                    NEW.lastmodified := CURRENT_TIMESTAMP;
+                END IF;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS {table}_touch_lastmodified ON {table};
+            CREATE TRIGGER {table}_touch_lastmodified
+                BEFORE UPDATE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION touch_{table}_lastmodified();
+        """
+        db.run_query(query)
+
+
 def create_all_tables(db):
     create_users_table(db)
     create_tweets_table(db)
+    create_tweet_clean_text(db)
+    create_tweet_search_index(db)
+    create_tweet_dup_clusters(db)
+    create_lastmodified_triggers(db)
     create_user_recommendations_table(db)
     create_actions_table(db)
     create_proxies_table(db)
+    create_user_embeddings_table(db)
+    create_user_features_table(db)
+    create_user_graph_metrics_table(db)
+    create_raw_responses_table(db)
+    create_tweet_metrics_history_table(db)
+    create_user_snapshots_table(db)
+    create_rollup_watermarks_table(db)
+    create_symbol_hourly_table(db)
+    create_user_daily_activity_table(db)
     print("All tables created successfully.")
 
 
 def drop_all_tables(db):
     drop_queries = [
+        "DROP TABLE IF EXISTS user_daily_activity CASCADE;",
+        "DROP TABLE IF EXISTS symbol_hourly CASCADE;",
+        "DROP TABLE IF EXISTS rollup_watermarks CASCADE;",
+        "DROP TABLE IF EXISTS user_snapshots CASCADE;",
+        "DROP TABLE IF EXISTS tweet_metrics_history CASCADE;",
+        "DROP TABLE IF EXISTS raw_responses CASCADE;",
+        "DROP TABLE IF EXISTS user_graph_metrics CASCADE;",
+        "DROP TABLE IF EXISTS user_features CASCADE;",
+        "DROP TABLE IF EXISTS user_embeddings CASCADE;",
         "DROP TABLE IF EXISTS actions CASCADE;",
         "DROP TABLE IF EXISTS tweets CASCADE;",
         "DROP TABLE IF EXISTS user_recommendations CASCADE;",
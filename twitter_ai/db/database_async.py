@@ -0,0 +1,152 @@
+import time
+from psycopg_pool import AsyncConnectionPool
+from db.database import Database
+from db.query_stats import get_query_stats
+
+
+class AsyncDatabase:
+    """
+    asyncio counterpart of Database built on psycopg3's async connection pool.
+
+    Every call borrows a pooled connection and commits when it is returned, so concurrent
+    tasks can share one AsyncDatabase without a thread hop or a reconnect per call.
+    """
+
+    prepared_queries = Database.prepared_queries
+
+    def __init__(self, host, database, user, password, min_size=1, max_size=10):
+        self.conn_params = {
+            "host": host,
+            "database": database,
+            "user": user,
+            "password": password,
+        }
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self.prepared_stats = {}
+
+    async def __aenter__(self):
+        self.pool = AsyncConnectionPool(
+            kwargs={
+                "host": self.conn_params["host"],
+                "dbname": self.conn_params["database"],
+                "user": self.conn_params["user"],
+                "password": self.conn_params["password"],
+            },
+            min_size=self.min_size,
+            max_size=self.max_size,
+            open=False,
+        )
+        await self.pool.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _check_pool(self):
+        if self.pool is None:
+            raise AttributeError(
+                "Pool is not initialized. Use AsyncDatabase as an async context manager."
+            )
+
+    async def run_query(self, query, params=None):
+        self._check_pool()
+        start = time.perf_counter()
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(query, params or ())
+            rows = None if cursor.description is None else await cursor.fetchall()
+        self._record_query(query, params, start, cursor.rowcount)
+        return rows
+
+    async def run_batch_query(self, query, params_list):
+        self._check_pool()
+        start = time.perf_counter()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(query, params_list)
+                rowcount = cursor.rowcount
+        self._record_query(query, params_list, start, rowcount)
+        return rowcount
+
+    async def run_insert_query(self, query, params_list):
+        if not isinstance(params_list[0], tuple):
+            params_list = [params_list]
+        return await self.run_batch_query(query, params_list)
+
+    async def run_prepared(self, name, params_list, returning=False):
+        """
+        Executes a query registered with Database.register_prepared for every params tuple.
+
+        Returns:
+            int: The number of affected rows, or with `returning` the list of rows
+            returned by all executions.
+        """
+        if not isinstance(params_list, list):
+            params_list = [params_list]
+        self._check_pool()
+        stats = self.prepared_stats.setdefault(
+            name, {"calls": 0, "rows": 0, "seconds": 0.0}
+        )
+        if not params_list:
+            return [] if returning else 0
+
+        start = time.perf_counter()
+        query = self.prepared_queries[name]
+        rows = []
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(query, params_list, returning=returning)
+                if returning:
+                    # Every execution has its own result set
+                    while True:
+                        rows.extend(await cursor.fetchall())
+                        if not cursor.nextset():
+                            break
+                    rowcount = len(rows)
+                else:
+                    rowcount = cursor.rowcount
+        self._record_query(query, params_list, start, rowcount)
+        stats["calls"] += len(params_list)
+        stats["rows"] += rowcount
+        stats["seconds"] += time.perf_counter() - start
+        return rows if returning else rowcount
+
+    def _record_query(self, query, params, start, rowcount):
+        # Plans are not captured here, EXPLAIN would need another await on the connection
+        query_stats = get_query_stats()
+        if query_stats is not None:
+            query_stats.record(query, params, time.perf_counter() - start, rowcount)
+
+    async def copy_records(self, table, columns, rows):
+        """
+        Bulk loads rows with COPY FROM STDIN in a single transaction.
+        """
+        self._check_pool()
+        count = 0
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                async with cursor.copy(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+                ) as copy:
+                    for row in rows:
+                        await copy.write_row(row)
+                        count += 1
+        return count
+
+    async def stream(self, query, params=None, itersize=1000):
+        """
+        Yields the rows of a query one at a time through a server-side cursor.
+        """
+        self._check_pool()
+        async with self.pool.connection() as conn:
+            async with conn.cursor(name="async_stream") as cursor:
+                cursor.itersize = itersize
+                await cursor.execute(query, params or ())
+                async for row in cursor:
+                    yield row
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
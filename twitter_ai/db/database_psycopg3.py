@@ -0,0 +1,214 @@
+import time
+from contextlib import contextmanager
+import psycopg
+from psycopg_pool import ConnectionPool
+from db.database import Database, ReplicaMixin
+from db.query_stats import get_query_stats
+
+# One pool per set of connection parameters, shared by all Psycopg3Database instances
+_pools = {}
+
+
+def get_pool(conn_params, max_size=10):
+    key = tuple(sorted(conn_params.items()))
+    if key not in _pools:
+        _pools[key] = ConnectionPool(
+            kwargs={
+                "host": conn_params["host"],
+                "dbname": conn_params["database"],
+                "user": conn_params["user"],
+                "password": conn_params["password"],
+            },
+            min_size=1,
+            max_size=max_size,
+            open=True,
+        )
+    return _pools[key]
+
+
+class Psycopg3Database:
+    """
+    psycopg3 implementation of the Database API backed by a shared connection pool.
+
+    executemany based helpers (run_batch_query, run_insert_query, run_prepared) are sent in
+    pipeline mode, so a batch costs a single round trip instead of one per row. Queries
+    that run more than `prepare_threshold` times on a connection are prepared by psycopg.
+    """
+
+    prepared_queries = Database.prepared_queries
+
+    def __init__(self, host, database, user, password, prepare_threshold=5):
+        self.conn_params = {
+            "host": host,
+            "database": database,
+            "user": user,
+            "password": password,
+        }
+        self.prepare_threshold = prepare_threshold
+        self.pool = None
+        self.connection = None
+        self.cursor = None
+        self.prepared_stats = {}
+        self.in_pipeline = False
+        self.commit_callbacks = []
+
+    register_prepared = Database.register_prepared
+
+    def __enter__(self):
+        try:
+            self.pool = get_pool(self.conn_params)
+            self.connection = self.pool.getconn()
+            self.connection.prepare_threshold = self.prepare_threshold
+            self.cursor = self.connection.cursor()
+        except psycopg.Error as e:
+            print(f"Error connecting to the database: {e}")
+            self.connection = None
+            self.cursor = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.connection:
+            if exc_type is not None:
+                self.connection.rollback()
+            else:
+                self.connection.commit()
+        self.close()
+
+    def _check_cursor(self):
+        if self.cursor is None:
+            raise AttributeError(
+                "Cursor is not initialized. Check the database connection."
+            )
+
+    def run_query(self, query, params=None):
+        self._check_cursor()
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        self._commit()  # Ensure that changes are committed
+        if self.in_pipeline:
+            # The description is only known once the results arrive, fetching syncs
+            try:
+                rows = self.cursor.fetchall()
+            except psycopg.ProgrammingError:
+                rows = None
+        else:
+            rows = None if self.cursor.description is None else self.cursor.fetchall()
+        self._record_query(query, params, start)
+        return rows
+
+    def execute(self, query, params=None):
+        """
+        Runs a statement whose result is not needed. Inside pipeline() it is only queued,
+        it is sent with the next statement that needs a result or with the final commit.
+        """
+        self._check_cursor()
+        start = time.perf_counter()
+        self.cursor.execute(query, params or ())
+        self._commit()
+        self._record_query(query, params, start)
+
+    def run_batch_query(self, query, params_list):
+        self._check_cursor()
+        start = time.perf_counter()
+        self.cursor.executemany(query, params_list)
+        self._commit()  # Ensure that changes are committed
+        self._record_query(query, params_list, start)
+
+        return self.cursor.rowcount
+
+    def run_insert_query(self, query, params_list):
+        if not isinstance(params_list[0], tuple):
+            params_list = [params_list]
+        return self.run_batch_query(query, params_list)
+
+    def run_prepared(self, name, params_list, returning=False):
+        """
+        Executes a registered query for every params tuple in one pipelined batch.
+
+        Returns:
+            int: The number of affected rows, or with `returning` the list of rows
+            returned by all executions.
+        """
+        if not isinstance(params_list, list):
+            params_list = [params_list]
+        self._check_cursor()
+        stats = self.prepared_stats.setdefault(
+            name, {"calls": 0, "rows": 0, "seconds": 0.0}
+        )
+        if not params_list:
+            return [] if returning else 0
+
+        start = time.perf_counter()
+        query = self.prepared_queries[name]
+        self.cursor.executemany(query, params_list, returning=returning)
+        rows = []
+        if returning:
+            # Every execution has its own result set
+            while True:
+                rows.extend(self.cursor.fetchall())
+                if not self.cursor.nextset():
+                    break
+            rowcount = len(rows)
+        else:
+            rowcount = self.cursor.rowcount
+        self._commit()
+        self._record_query(query, params_list, start, rowcount)
+
+        stats["calls"] += len(params_list)
+        stats["rows"] += rowcount
+        stats["seconds"] += time.perf_counter() - start
+        return rows if returning else rowcount
+
+    _record_query = Database._record_query
+    _explain = Database._explain
+    _commit = Database._commit
+    after_commit = Database.after_commit
+    _run_commit_callbacks = Database._run_commit_callbacks
+
+    @contextmanager
+    def pipeline(self):
+        """
+        Sends every statement issued inside the block without waiting for its result,
+        in a single transaction committed when the block exits or rolled back if it
+        raises. Results are synchronized only when they are fetched and on commit.
+        """
+        self._check_cursor()
+        self.in_pipeline = True
+        try:
+            with self.connection.pipeline():
+                yield self
+                self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            self.commit_callbacks = []
+            raise
+        finally:
+            self.in_pipeline = False
+        self._run_commit_callbacks()
+
+    def copy_records(self, table, columns, rows):
+        """
+        Loads rows with COPY FROM STDIN, values are adapted by psycopg (None, lists, ...).
+        The caller is responsible for committing the transaction.
+        """
+        self._check_cursor()
+        count = 0
+        with self.cursor.copy(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+        return count
+
+    def close(self):
+        if self.cursor:
+            self.cursor.close()
+        if self.connection and self.pool:
+            self.pool.putconn(self.connection)
+        self.cursor = None
+        self.connection = None
+
+
+class Psycopg3ReplicaDatabase(ReplicaMixin, Psycopg3Database):
+    pass
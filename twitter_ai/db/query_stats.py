@@ -0,0 +1,157 @@
+import functools
+import hashlib
+import logging
+import re
+import signal
+import threading
+from utils.config import Config
+
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDER_PATTERN = re.compile(r"%s|\$\d+")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+VALUE_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+REPEATED_LIST_PATTERN = re.compile(r"\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+EXPLAINABLE_STATEMENTS = ("select", "with", "insert", "update", "delete")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_query(query):
+    """
+    Replaces literals and placeholders with ? and collapses value lists, so that
+    `IN (%s, %s, %s)` built for 3 or 300 ids is reported as the same query.
+    """
+    query = COMMENT_PATTERN.sub(" ", query)
+    query = STRING_PATTERN.sub("?", query)
+    query = PLACEHOLDER_PATTERN.sub("?", query)
+    query = NUMBER_PATTERN.sub("?", query)
+    query = WHITESPACE_PATTERN.sub(" ", query).strip().rstrip(";").strip()
+    query = VALUE_LIST_PATTERN.sub("(?, ...)", query)
+    return REPEATED_LIST_PATTERN.sub("(?, ...), ...", query)
+
+
+def query_fingerprint(query):
+    return hashlib.md5(normalize_query(query).encode("utf-8")).hexdigest()[:12]
+
+
+def value_shape(value):
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(params):
+    """
+    Describes the parameters of a call without logging their values,
+    e.g. "(str[19], int)" or "25 x (str[19], str[8], ...)" for a batch.
+    """
+    if not params:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {value_shape(v)}" for k, v in params.items()) + "}"
+    if isinstance(params, list) and isinstance(params[0], (tuple, list, dict)):
+        return f"{len(params)} x {params_shape(params[0])}"
+    return "(" + ", ".join(value_shape(value) for value in params) + ")"
+
+
+class QueryStats:
+    """
+    Per-process timing of every query run through the Database classes, aggregated
+    by normalized query fingerprint.
+
+    Queries slower than `slow_ms` are logged with the shape of their parameters. With
+    `explain` set, the plan of a slow query is captured each time it beats its own
+    slowest run, and kept with the aggregates.
+    """
+
+    def __init__(self, slow_ms=500, explain=False):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.aggregates = {}
+        # Reentrant: the SIGUSR1 dump runs on the main thread, possibly inside record()
+        self.lock = threading.RLock()
+
+    def record(self, query, params, seconds, rowcount, explain=None):
+        fingerprint = query_fingerprint(query)
+        with self.lock:
+            stats = self.aggregates.setdefault(
+                fingerprint,
+                {
+                    "query": normalize_query(query),
+                    "calls": 0,
+                    "rows": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "plan": None,
+                },
+            )
+            is_slowest = seconds > stats["max_seconds"]
+            stats["calls"] += 1
+            stats["rows"] += max(rowcount or 0, 0)
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+        if seconds * 1000 < self.slow_ms:
+            return
+        logging.warning(
+            f"Slow query {fingerprint} took {seconds * 1000:.0f}ms, rows={rowcount}, "
+            f"params={params_shape(params)}: {stats['query'][:500]}"
+        )
+        if self.explain and explain and is_slowest and is_explainable(query):
+            try:
+                plan = explain(query, params)
+                if plan is not None:
+                    stats["plan"] = plan
+                    logging.warning(f"Plan of slow query {fingerprint}:\n{plan}")
+            except Exception as e:
+                logging.error(f"Failed to explain query {fingerprint}: {e}")
+
+    def report(self):
+        """
+        Returns the aggregates sorted by total time, slowest first.
+        """
+        with self.lock:
+            rows = [
+                dict(stats, fingerprint=fingerprint)
+                for fingerprint, stats in self.aggregates.items()
+            ]
+        return sorted(rows, key=lambda stats: stats["seconds"], reverse=True)
+
+    def dump(self):
+        lines = [
+            f"{stats['fingerprint']} calls={stats['calls']} total={stats['seconds']:.3f}s "
+            f"mean={stats['seconds'] / stats['calls'] * 1000:.1f}ms "
+            f"max={stats['max_seconds'] * 1000:.1f}ms rows={stats['rows']}: "
+            f"{stats['query'][:200]}"
+            for stats in self.report()
+        ]
+        logging.info("Query stats:\n" + "\n".join(lines))
+
+
+def is_explainable(query):
+    first_word = normalize_query(query).split(" ", 1)[0].lower()
+    return first_word in EXPLAINABLE_STATEMENTS
+
+
+_query_stats = None
+
+
+def get_query_stats():
+    """
+    Returns the process wide QueryStats if DB_QUERY_STATS is enabled, otherwise None.
+    The first call installs a SIGUSR1 handler that dumps the aggregates to the log.
+    """
+    global _query_stats
+    if _query_stats is None and Config.DB_QUERY_STATS:
+        _query_stats = QueryStats(Config.DB_SLOW_QUERY_MS, Config.DB_EXPLAIN_SLOW_QUERIES)
+        if hasattr(signal, "SIGUSR1"):
+            try:
+                signal.signal(signal.SIGUSR1, lambda signum, frame: _query_stats.dump())
+            except ValueError:
+                # Signal handlers can only be installed from the main thread
+                logging.info("Query stats enabled, SIGUSR1 dump is not available")
+    return _query_stats
@@ -0,0 +1,147 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import pandas as pd
+from utils.config import configure_logging
+from utils.db_utils import get_db_connection, get_modified_watermark
+
+configure_logging()
+
+# Column used as the high-water mark for every exported table. lastmodified is bumped by
+# the lastmodified triggers on any update, except for changes of users.status alone.
+EXPORT_TABLES = {
+    "tweets": "lastmodified",
+    "users": "lastmodified",
+    "user_recommendations": "created_at",
+    "actions": "created_at",
+}
+WATERMARKS_FILE = "_watermarks.json"
+CHUNK_ROWS = 100000
+
+
+def load_watermarks(output_dir):
+    path = os.path.join(output_dir, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {
+            table: datetime.datetime.fromisoformat(value)
+            for table, value in json.load(f).items()
+        }
+
+
+def save_watermarks(output_dir, watermarks):
+    path = os.path.join(output_dir, WATERMARKS_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({table: value.isoformat() for table, value in watermarks.items()}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def get_select_columns(db, table):
+    """
+    Returns the select expressions and the column names of a table.
+    JSONB columns are exported as text since their shape differs from row to row.
+    """
+    query = """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+        ORDER BY ordinal_position;
+    """
+    columns = db.run_query(query, (table,))
+    return [
+        f"{name}::text AS {name}" if data_type == "jsonb" else name
+        for name, data_type in columns
+    ], [name for name, _ in columns]
+
+
+def write_partitions(df, output_dir, table, timestamp_column, part_name):
+    """
+    Writes a chunk of rows into date partitions (table/date=YYYY-MM-DD/part.parquet)
+    based on the day the rows were modified.
+    """
+    dates = pd.to_datetime(df[timestamp_column]).dt.date
+    for date, partition in df.groupby(dates):
+        partition_dir = os.path.join(output_dir, table, f"date={date.isoformat()}")
+        os.makedirs(partition_dir, exist_ok=True)
+        partition.to_parquet(
+            os.path.join(partition_dir, f"{part_name}.parquet"), index=False
+        )
+
+
+def export_table(db, table, output_dir, since, until):
+    """
+    Exports rows of `table` whose high-water mark column is in (since, until].
+
+    Rows that changed again after a previous export are written once more, readers should
+    keep the latest version of each primary key.
+
+    Returns:
+        int: The number of exported rows.
+    """
+    timestamp_column = EXPORT_TABLES[table]
+    select_columns, column_names = get_select_columns(db, table)
+    query = f"""
+        SELECT {", ".join(select_columns)}
+        FROM {table}
+        WHERE {timestamp_column} > %s AND {timestamp_column} <= %s
+        ORDER BY {timestamp_column};
+    """
+    run_id = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    exported = 0
+
+    # A named cursor keeps the result set on the server and streams it in chunks
+    with db.connection.cursor(name=f"export_{table}") as cursor:
+        cursor.itersize = CHUNK_ROWS
+        cursor.execute(query, (since, until))
+        chunk_number = 0
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            df = pd.DataFrame(rows, columns=column_names)
+            write_partitions(
+                df, output_dir, table, timestamp_column, f"part-{run_id}-{chunk_number}"
+            )
+            exported += len(rows)
+            chunk_number += 1
+
+    return exported
+
+
+def export_all(output_dir, tables=None):
+    os.makedirs(output_dir, exist_ok=True)
+    watermarks = load_watermarks(output_dir)
+
+    # The bound is taken on the primary, which sees the transactions still in progress
+    with get_db_connection() as primary:
+        until = get_modified_watermark(primary)
+
+    with get_db_connection(role="read") as db:
+        for table in tables or EXPORT_TABLES:
+            since = watermarks.get(table, datetime.datetime(1970, 1, 1))
+            if until <= since:
+                continue
+            exported = export_table(db, table, output_dir, since, until)
+            watermarks[table] = until
+            save_watermarks(output_dir, watermarks)
+            logging.info(f"Exported {exported} rows from {table} changed since {since}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incrementally export tables to date partitioned Parquet files."
+    )
+    parser.add_argument("output_dir", type=str, help="Directory for the Parquet files.")
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=list(EXPORT_TABLES),
+        default=list(EXPORT_TABLES),
+        help="Tables to export.",
+    )
+    args = parser.parse_args()
+
+    export_all(args.output_dir, args.tables)
@@ -23,14 +23,17 @@ def fetch_account_to_follow(db):
                 users.friends_count
             FROM users
             LEFT JOIN actions ON users.rest_id = actions.target_user_id AND actions.action_type = 'follow'
-            JOIN tweets ON users.rest_id = tweets.user_id
             WHERE actions.target_user_id IS NULL
                 AND users.followers_count > 100
                 AND users.friends_count > 100
-                AND users.friends_count / users.followers_count > 0.8
+                AND users.friends_count::float / users.followers_count > 0.8
                 AND users.llm_check_score > 5
-                AND tweets.created_at > NOW() - INTERVAL '48 HOURS'
-            GROUP BY users.rest_id, users.followers_count, users.friends_count
+                -- Days overlapping the last 48 hours
+                AND EXISTS (
+                    SELECT 1 FROM user_daily_activity a
+                    WHERE a.user_id = users.rest_id
+                    AND a.day >= (NOW() - INTERVAL '48 HOURS')::date
+                )
             ORDER BY users.friends_count desc
             LIMIT 1
         )
@@ -5,16 +5,21 @@ import random
 from datetime import datetime, timedelta
 from utils.db_utils import (
     get_db_connection,
+    insert_tweets,
     update_user_tweets_status,
     get_most_mentioned_new_users,
 )
 from utils.twitter_utils import get_twitter_scraper, choose_account
 from utils.common_utils import (
     fetch_tweets_for_users,
-    save_tweets_to_db,
+    collect_tweet_results,
+    save_tweet_results,
     process_and_insert_users,
 )
 from utils.config import configure_logging, Config
+from utils.metrics import timer, observe, start_metrics_server
+from utils.known_users import load_known_users
+from db.database import maintain_tweet_metrics_partitions
 
 configure_logging()
 
@@ -24,6 +29,7 @@ CYCLE_DELAY = 0  # Base delay for the cycle in seconds
 COOKIE_UPDATE_INTERVAL = timedelta(hours=24)
 
 
+@timer("db_query_seconds", query="get_users_to_parse")
 def get_users_to_parse(db, limit_users=2):
     query = """
         WITH recent_tweets AS (
@@ -96,17 +102,50 @@ def reset_status(db, user_ids):
     """.format(
         ", ".join(["%s"] * len(user_ids))
     )
-    db.run_query(reset_status_query, tuple(user_ids))
+    db.execute(reset_status_query, tuple(user_ids))
+
+
+def update_parsed_status(db, user_ids, inserted_tweets_count):
+    if inserted_tweets_count > 0:
+        update_user_tweets_status(db, user_ids)
+    else:
+        reset_status(db, user_ids)
+
+
+def save_tweets_and_status(db, user_ids, tweets):
+    """
+    Upserts the tweets of a cycle as one batch and updates the status of the parsed users
+    in the same transaction. With the psycopg3 backend the whole block is pipelined, so it
+    costs a couple of round trips instead of two per tweet. If the batch fails, tweets are
+    saved one by one so that a single bad row does not lose the others.
+    """
+    tweet_results = collect_tweet_results(db, tweets)
+    try:
+        with db.pipeline():
+            inserted_tweets_count = insert_tweets(db, tweet_results)
+            update_parsed_status(db, user_ids, inserted_tweets_count)
+        return inserted_tweets_count
+    except Exception as e:
+        logging.error(
+            f"Batch insert of {len(tweet_results)} tweets failed, saving them one by one: {e}"
+        )
+    inserted_tweets_count = save_tweet_results(db, tweet_results)
+    update_parsed_status(db, user_ids, inserted_tweets_count)
+    return inserted_tweets_count
 
 
 def main(account_name=None):
     last_cookie_update_time = datetime.now()
     account = choose_account(account_name) if account_name else None
+    start_metrics_server(Config.METRICS_PORT)
 
     with get_db_connection() as db:
+        load_known_users(db)
         while True:
             user_ids = []  # Initialize here to prevent UnboundLocalError
+            cycle_start = time.perf_counter()
             try:
+                maintain_tweet_metrics_partitions(db)
                 current_time = datetime.now()
                 if (
                     account
@@ -123,34 +162,39 @@ def main(account_name=None):
 
                 if user_ids:
                     logging.info(f"Processing users: {user_ids}")
-                    tweets = fetch_tweets_for_users(
-                        scraper,
-                        user_ids,
-                        limit_pages=PAGES_PER_USER,
-                        max_retries=1,
-                        backoff_factor=0,
-                    )
+                    with timer("stage_seconds", worker="parse", stage="fetch_tweets"):
+                        tweets = fetch_tweets_for_users(
+                            scraper,
+                            user_ids,
+                            limit_pages=PAGES_PER_USER,
+                            max_retries=1,
+                            backoff_factor=0,
+                        )
                     if tweets:
-                        inserted_tweets_count = save_tweets_to_db(db, tweets)
-                        if inserted_tweets_count > 0:
-                            update_user_tweets_status(db, user_ids)
-                        else:
-                            reset_status(db, user_ids)
+                        with timer("stage_seconds", worker="parse", stage="save_tweets"):
+                            save_tweets_and_status(db, user_ids, tweets)
                     else:
                         reset_status(db, user_ids)
                 else:
                     logging.info(
                         "No users to pull tweets. Adding new recommended users"
                     )
-                    user_ids = [
-                        user[0]
-                        for user in get_most_mentioned_new_users(db, limit_users=200)
-                    ]
-                    new_users_count = process_and_insert_users(db, scraper, user_ids)
+                    with get_db_connection(role="read") as read_db:
+                        user_ids = [
+                            user[0]
+                            for user in get_most_mentioned_new_users(
+                                read_db, limit_users=200
+                            )
+                        ]
+                    with timer("stage_seconds", worker="parse", stage="insert_users"):
+                        new_users_count = process_and_insert_users(
+                            db, scraper, user_ids
+                        )
                     logging.info(
                         f"New users inserted by most mentioned algo {new_users_count}"
                     )
 
+                observe("cycle_seconds", time.perf_counter() - cycle_start, worker="parse")
                 logging.info("Cycle complete. Waiting for the next cycle.")
                 random_sleep_time = random.uniform(CYCLE_DELAY * 0.5, CYCLE_DELAY * 1.5)
                 time.sleep(random_sleep_time)
@@ -60,22 +60,10 @@ TWEETS TO ANALYZE:
 def fetch_tweets_from_db(db):
     query = """
         WITH top_tweets AS (
-            SELECT tweet_text
+            SELECT DISTINCT ON (COALESCE(dup_cluster_id, tweet_id)) tweet_text, views
             FROM tweets
             JOIN users ON tweets.user_id = users.rest_id
-            WHERE 
-            length(
-                regexp_replace(
-                    regexp_replace(
-                        regexp_replace(
-                            regexp_replace(tweet_text, 'https?://[^\s]+', '', 'g'), 
-                            '@[A-Za-z0-9_]+', '', 'g'
-                        ), 
-                        '\$[A-Za-z0-9]+', '', 'g'
-                    ), 
-                    '#[A-Za-z0-9_]+', '', 'g'
-                )
-            ) > 50            
+            WHERE clean_text_length > 50
             AND users.llm_check_score > 6
             AND has_urls = False
             AND tweets.created_at > NOW() - INTERVAL '24 HOURS'
@@ -85,11 +73,13 @@ def fetch_tweets_from_db(db):
             AND users.rest_id not in (select distinct action_account_id from actions)
             AND (users_mentioned is null or array_length(users_mentioned, 1)  < 3 or users_mentioned::text = '{}')
             AND (symbols is null or array_length(symbols, 1)  < 4 or symbols::text = '{}')
-            ORDER BY tweets.views DESC
-            LIMIT 400
+            -- The most viewed tweet of every near-duplicate cluster
+            ORDER BY COALESCE(dup_cluster_id, tweet_id), tweets.views DESC
         )
         SELECT tweet_text
-        FROM top_tweets
+        FROM (
+            SELECT tweet_text FROM top_tweets ORDER BY views DESC LIMIT 400
+        ) AS most_viewed
         ORDER BY random()
         LIMIT 75;
     """
@@ -0,0 +1,108 @@
+import logging
+import numpy as np
+
+# Phrases describing the topic we are looking for, their mean embedding is the topic centroid
+CRYPTO_TOPIC_SEEDS = [
+    "Bitcoin price analysis and crypto market update",
+    "Ethereum, Solana and altcoins trading on crypto exchanges",
+    "DeFi protocols, liquidity pools, yield farming and staking",
+    "New token launch, airdrop and memecoin on chain",
+    "Web3 wallets, NFTs and blockchain development",
+    "$BTC $ETH $SOL long short leverage perps",
+]
+
+
+class EmbeddingPreFilter:
+    """
+    Scores users locally by the cosine similarity between their bio/tweets embedding and a
+    crypto-topic centroid. Only users falling between the two thresholds need the remote LLM.
+    """
+
+    DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+    def __init__(
+        self,
+        model=None,
+        negative_threshold=0.2,
+        positive_threshold=0.5,
+        negative_score=0.0,
+        positive_score=7.0,
+        max_tweets=20,
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "sentence-transformers is required for the embedding pre-filter, "
+                "install it with `pip install sentence-transformers`"
+            ) from e
+
+        self.model_name = model or self.DEFAULT_MODEL
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        self.negative_threshold = negative_threshold
+        self.positive_threshold = positive_threshold
+        self.negative_score = negative_score
+        self.positive_score = positive_score
+        self.max_tweets = max_tweets
+        self.centroid = self._normalize(self.encode(CRYPTO_TOPIC_SEEDS).mean(axis=0))
+
+    @staticmethod
+    def _normalize(vector):
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts):
+        return self.model.encode(
+            texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True
+        )
+
+    def embed_user(self, bio, tweets):
+        """
+        Embeds the bio and the latest tweets and returns their normalized mean vector.
+        """
+        texts = [tweet[0] for tweet in tweets[: self.max_tweets] if tweet[0]]
+        if bio:
+            texts.append(bio)
+        if not texts:
+            return None
+        return self._normalize(self.encode(texts).mean(axis=0))
+
+    def similarity(self, embedding):
+        return float(np.dot(embedding, self.centroid))
+
+    def classify(self, similarity):
+        """
+        Returns a local score for clear negatives/positives, or None if the user is ambiguous.
+        """
+        if similarity <= self.negative_threshold:
+            return self.negative_score
+        if similarity >= self.positive_threshold:
+            return self.positive_score
+        return None
+
+    def score_user(self, db, user_id, bio, tweets):
+        embedding = self.embed_user(bio, tweets)
+        if embedding is None:
+            return None
+
+        similarity = self.similarity(embedding)
+        save_user_embedding(db, user_id, self.model_name, embedding, similarity)
+
+        score = self.classify(similarity)
+        logging.info(
+            f"User {user_id} topic similarity: {similarity:.3f}, local score: {score}"
+        )
+        return score
+
+
+def save_user_embedding(db, user_id, model, embedding, similarity):
+    query = """
+        INSERT INTO user_embeddings (rest_id, model, embedding, topic_similarity)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (rest_id) DO UPDATE SET
+            model = EXCLUDED.model,
+            embedding = EXCLUDED.embedding,
+            topic_similarity = EXCLUDED.topic_similarity,
+            created_at = CURRENT_TIMESTAMP;
+    """
+    db.run_query(query, (user_id, model, embedding.tolist(), similarity))
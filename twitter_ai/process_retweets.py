@@ -1,7 +1,16 @@
 import time
 import logging
-from db.database import Database
-from utils.db_utils import insert_users, insert_tweets, get_db_connection
+from db.database import Database, maintain_tweet_metrics_partitions
+from utils.db_utils import (
+    insert_users,
+    insert_user_placeholders,
+    insert_tweets,
+    get_db_connection,
+    get_existing_user_ids,
+)
+from utils.known_users import get_known_users, load_known_users
+from utils.config import Config
+from utils.metrics import timer, start_metrics_server
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -28,37 +37,38 @@ def process_tweets(db, tweets):
         insert_users(db, user_data)
 
     # Ensure all tweet authors exist in users table
+    inserted_user_ids = {user_info.get("rest_id") for user_info in user_data}
     user_ids = []
     for tweet_info in tweet_data:
         try:
             user_id = tweet_info["legacy"]["user_id_str"]
-            user_ids.append(user_id)
+            if user_id not in inserted_user_ids:
+                user_ids.append(user_id)
         except KeyError:
             logging.error(
                 "Missing user_id_str in tweet_info", extra={"tweet_info": tweet_info}
             )
+    user_ids = list(dict.fromkeys(user_ids))
 
     if user_ids:
-        placeholders = ", ".join(["%s"] * len(user_ids))
-        existing = db.run_query(
-            f"SELECT rest_id FROM users WHERE rest_id IN ({placeholders})", user_ids
-        )
-        existing_users = {row[0] for row in existing}
-        missing_users = [
-            {"rest_id": uid, "legacy": {}, "professional": {}}
-            for uid in user_ids
-            if uid not in existing_users
-        ]
+        # Authors missing from the known users filter are new, only the others are looked up
+        known_users = get_known_users()
+        maybe_known = known_users.split(user_ids)[0] if known_users else user_ids
+        existing_users = get_existing_user_ids(db, maybe_known)
+        # A stale filter may call an existing user new, the placeholder insert then
+        # leaves the stored profile alone
+        missing_users = [uid for uid in user_ids if uid not in existing_users]
 
         if missing_users:
             logging.info(f"Inserting {len(missing_users)} minimal user records")
-            insert_users(db, missing_users)
+            insert_user_placeholders(db, missing_users)
 
     if tweet_data:
         logging.info(f"Inserting {len(tweet_data)} tweets into the database.")
         insert_tweets(db, tweet_data)
 
 
+@timer("db_query_seconds", query="fetch_tweets_to_process")
 def fetch_tweets_to_process(db, limit=1000):
     query = """
         SELECT t.retweeted_tweet, t.quoted_tweet
@@ -85,16 +95,20 @@ def fetch_tweets_to_process(db, limit=1000):
 
 
 def job():
+    start_metrics_server(Config.METRICS_PORT)
     with get_db_connection() as db:
+        load_known_users(db)
         while True:
             try:
+                maintain_tweet_metrics_partitions(db)
                 tweets = fetch_tweets_to_process(db)
                 if not tweets:
                     logging.info("No tweets to process. Sleeping for 5 minutes...")
                     time.sleep(300)
                     continue
 
-                process_tweets(db, tweets)
+                with timer("cycle_seconds", worker="process_retweets"):
+                    process_tweets(db, tweets)
                 logging.info("Processed batch of tweets")
                 time.sleep(10)
 
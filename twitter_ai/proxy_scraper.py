@@ -3,7 +3,7 @@ import logging
 from utils.proxy_utils import ProxyManager
 import aiohttp
 from bs4 import BeautifulSoup
-from utils.db_utils import get_db_connection
+from utils.db_utils import get_async_db_connection
 import itertools
 
 logging.basicConfig(level=logging.INFO)
@@ -37,7 +37,7 @@ SCRAPE_SOURCES = [
 ]
 
 
-async def check_proxy(proxy_manager, proxy):
+async def check_proxy(proxy_manager, db, proxy):
     try:
         headers = HEADERS.copy()
         async with aiohttp.ClientSession(
@@ -59,19 +59,15 @@ async def check_proxy(proxy_manager, proxy):
                 if not guest_token:
                     raise ValueError("Missing guest token in response")
 
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                None, proxy_manager.update_proxy_token, proxy, guest_token
-            )
+            await proxy_manager.async_update_proxy_token(db, proxy, guest_token)
             logger.info(f"Validated proxy {proxy}")
 
     except Exception as e:
         logger.error(f"Proxy {proxy} failed: {str(e)}")
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, proxy_manager.mark_bad, proxy, str(e))
+        await proxy_manager.async_mark_bad(db, proxy, str(e))
 
 
-async def check_proxies_async(proxy_manager):
+async def check_proxies_async(proxy_manager, db):
     query = """
         SELECT address FROM proxies 
         WHERE (
@@ -83,8 +79,7 @@ async def check_proxies_async(proxy_manager):
         LIMIT 1000
         FOR UPDATE SKIP LOCKED;
     """
-    with get_db_connection() as db:
-        proxies = [p[0] for p in db.run_query(query) or []]
+    proxies = [p[0] for p in await db.run_query(query) or []]
 
     if not proxies:
         return
@@ -93,7 +88,7 @@ async def check_proxies_async(proxy_manager):
 
     async def check(proxy):
         async with semaphore:
-            await check_proxy(proxy_manager, proxy)
+            await check_proxy(proxy_manager, db, proxy)
 
     tasks = [check(proxy) for proxy in proxies]
     await asyncio.gather(*tasks)
@@ -151,15 +146,16 @@ def chunks(iterable, size):
 
 async def main_loop():
     proxy_manager = ProxyManager()
-    while True:
-        logger.info("Starting proxy scraping cycle")
-        await scrape_proxies_async(proxy_manager)
+    async with get_async_db_connection(max_size=20) as db:
+        while True:
+            logger.info("Starting proxy scraping cycle")
+            await scrape_proxies_async(proxy_manager)
 
-        logger.info("Starting proxy validation cycle")
-        await check_proxies_async(proxy_manager)
+            logger.info("Starting proxy validation cycle")
+            await check_proxies_async(proxy_manager, db)
 
-        logger.info("Cycle completed, sleeping for 10 seconds")
-        await asyncio.sleep(10)
+            logger.info("Cycle completed, sleeping for 10 seconds")
+            await asyncio.sleep(10)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,345 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from utils.config import configure_logging
+from utils.db_utils import (
+    get_db_connection,
+    copy_rows,
+    build_user_params,
+    build_tweet_params,
+    USER_COLUMNS,
+    TWEET_COLUMNS,
+    USERS_ON_CONFLICT,
+    TWEETS_ON_CONFLICT,
+)
+from utils.known_users import open_known_users
+from utils.common_utils import extract_users_and_ids, get_entry_tweet_results
+from utils.json_stream import (
+    iter_json_items,
+    iter_timeline_entries,
+    USER_TWEETS_INSTRUCTIONS,
+    CONNECT_TAB_INSTRUCTIONS,
+    USERS_BY_REST_IDS_ITEMS,
+)
+
+configure_logging()
+
+USER_TWEETS = "UserTweets"
+CONNECT_TAB_TIMELINE = "ConnectTabTimeline"
+USERS_BY_REST_IDS = "UsersByRestIds"
+SUPPORTED_ENDPOINTS = [USER_TWEETS, CONNECT_TAB_TIMELINE, USERS_BY_REST_IDS]
+
+RECOMMENDATION_COLUMNS = ["rest_id", "recommended_user_id"]
+
+# Files above this size are streamed in the main process instead of being parsed whole in a worker
+LARGE_FILE_BYTES = 256 * 1024 * 1024
+
+
+def get_endpoint(path):
+    """
+    Archived responses are saved as <time_ns>_<Endpoint>.json.
+    """
+    return Path(path).stem.rsplit("_", 1)[-1]
+
+
+def get_context_user_id(path):
+    """
+    Returns the user id encoded in the parent directory name (e.g. {"contextualUserId":532561541}).
+    """
+    try:
+        params = json.loads(Path(path).parent.name)
+    except ValueError:
+        return None
+    if not isinstance(params, dict):
+        return None
+    user_id = params.get("contextualUserId") or params.get("userId")
+    return str(user_id) if user_id else None
+
+
+def find_archive_files(directory, endpoints=SUPPORTED_ENDPOINTS):
+    files = [
+        str(path)
+        for path in Path(directory).rglob("*.json")
+        if get_endpoint(path) in endpoints
+    ]
+    # File names start with the fetch time, so later responses win on conflicts
+    return sorted(files, key=lambda path: os.path.basename(path))
+
+
+def new_result():
+    return {"users": [], "tweets": [], "recommendations": [], "errors": 0}
+
+
+def result_rows(result):
+    return sum(len(result[key]) for key in ("users", "tweets", "recommendations"))
+
+
+def parse_user_tweets_entry(entry, result, context_user_id):
+    tweet_results = get_entry_tweet_results(entry)
+    if tweet_results is None:
+        return
+    result["tweets"].append(build_tweet_params(tweet_results))
+    author = tweet_results.get("core", {}).get("user_results", {}).get("result")
+    if author and author.get("rest_id"):
+        result["users"].append(build_user_params(author))
+
+
+def parse_connect_tab_entry(entry, result, context_user_id):
+    users, rest_ids = extract_users_and_ids(entry)
+    result["users"].extend(build_user_params(user) for user in users)
+    if context_user_id:
+        result["recommendations"].extend(
+            (context_user_id, rest_id) for rest_id in rest_ids
+        )
+
+
+def parse_users_by_rest_ids_item(item, result, context_user_id):
+    user = item.get("result")
+    if user and user.get("rest_id"):
+        result["users"].append(build_user_params(user))
+
+
+ENDPOINT_PARSERS = {
+    USER_TWEETS: (
+        iter_timeline_entries,
+        USER_TWEETS_INSTRUCTIONS,
+        parse_user_tweets_entry,
+    ),
+    CONNECT_TAB_TIMELINE: (
+        iter_timeline_entries,
+        CONNECT_TAB_INSTRUCTIONS,
+        parse_connect_tab_entry,
+    ),
+    USERS_BY_REST_IDS: (
+        iter_json_items,
+        USERS_BY_REST_IDS_ITEMS,
+        parse_users_by_rest_ids_item,
+    ),
+}
+
+
+def iter_archive_results(path, batch_rows=50000):
+    """
+    Streams the entries of one archived response file and yields parsed rows in batches
+    of at most `batch_rows`, so that memory use stays flat regardless of the file size.
+    """
+    endpoint = get_endpoint(path)
+    iter_items, prefix, parse_item = ENDPOINT_PARSERS[endpoint]
+    context_user_id = get_context_user_id(path)
+    result = new_result()
+
+    try:
+        for item in iter_items(path, prefix):
+            try:
+                parse_item(item, result, context_user_id)
+            except Exception as e:
+                logging.error(f"Failed to parse {endpoint} item in {path}: {e}")
+                result["errors"] += 1
+            if result_rows(result) >= batch_rows:
+                yield result
+                result = new_result()
+    except Exception as e:
+        logging.error(f"Failed to read {path}: {e}")
+        result["errors"] += 1
+
+    yield result
+
+
+def parse_archive_file(path):
+    """
+    Parses one archived GraphQL response file into rows ready to be copied into the database.
+    Runs in worker processes, so it must not touch the database.
+    """
+    parsed = new_result()
+    for result in iter_archive_results(path, batch_rows=float("inf")):
+        for key in ("users", "tweets", "recommendations"):
+            parsed[key].extend(result[key])
+        parsed["errors"] += result["errors"]
+    return parsed
+
+
+class ArchiveWriter:
+    """
+    Accumulates parsed rows and writes them through COPY into temporary staging tables,
+    then upserts them into the main tables with the same conflict rules as insert_users/insert_tweets.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.users = []
+        self.tweets = []
+        self.recommendations = []
+        self.stats = {"users": 0, "tweets": 0, "recommendations": 0}
+        self._create_staging_tables()
+
+    def _create_staging_tables(self):
+        self.db.cursor.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS users_staging (LIKE users, seq BIGSERIAL);
+            CREATE TEMP TABLE IF NOT EXISTS tweets_staging (LIKE tweets, seq BIGSERIAL);
+            CREATE TEMP TABLE IF NOT EXISTS user_recommendations_staging (LIKE user_recommendations);
+            """
+        )
+        self.db.connection.commit()
+
+    def add(self, result):
+        self.users.extend(result["users"])
+        self.tweets.extend(result["tweets"])
+        self.recommendations.extend(result["recommendations"])
+
+    def pending(self):
+        return len(self.users) + len(self.tweets) + len(self.recommendations)
+
+    def flush(self):
+        cursor = self.db.cursor
+        copy_rows(self.db, "users_staging", USER_COLUMNS, self.users)
+        copy_rows(self.db, "tweets_staging", TWEET_COLUMNS, self.tweets)
+        copy_rows(
+            self.db,
+            "user_recommendations_staging",
+            RECOMMENDATION_COLUMNS,
+            self.recommendations,
+        )
+
+        columns = ", ".join(USER_COLUMNS)
+        cursor.execute(
+            f"""
+            INSERT INTO users ({columns})
+            SELECT DISTINCT ON (rest_id) {columns}
+            FROM users_staging
+            WHERE rest_id <> ''
+            ORDER BY rest_id, seq DESC
+            {USERS_ON_CONFLICT};
+            """
+        )
+        self.stats["users"] += cursor.rowcount
+
+        # Minimal user records so that tweets and recommendations satisfy the foreign keys
+        cursor.execute(
+            """
+            INSERT INTO users (rest_id)
+            SELECT user_id FROM tweets_staging WHERE user_id <> ''
+            UNION
+            SELECT rest_id FROM user_recommendations_staging
+            UNION
+            SELECT recommended_user_id FROM user_recommendations_staging
+            ON CONFLICT (rest_id) DO NOTHING;
+            """
+        )
+
+        columns = ", ".join(TWEET_COLUMNS)
+        cursor.execute(
+            f"""
+            INSERT INTO tweets ({columns})
+            SELECT DISTINCT ON (tweet_id) {columns}
+            FROM tweets_staging
+            WHERE user_id <> ''
+            ORDER BY tweet_id, seq DESC
+            {TWEETS_ON_CONFLICT};
+            """
+        )
+        self.stats["tweets"] += cursor.rowcount
+
+        cursor.execute(
+            """
+            INSERT INTO user_recommendations (rest_id, recommended_user_id)
+            SELECT DISTINCT rest_id, recommended_user_id
+            FROM user_recommendations_staging
+            ON CONFLICT (rest_id, recommended_user_id) DO NOTHING;
+            """
+        )
+        self.stats["recommendations"] += cursor.rowcount
+
+        cursor.execute(
+            """
+            UPDATE users
+            SET recommendations_pulled = TRUE,
+                recommendations_pulled_last_timestamp = COALESCE(
+                    recommendations_pulled_last_timestamp, NOW() AT TIME ZONE 'utc'
+                )
+            WHERE rest_id IN (SELECT rest_id FROM user_recommendations_staging);
+
+            TRUNCATE users_staging, tweets_staging, user_recommendations_staging;
+            """
+        )
+        self.db.connection.commit()
+
+        # Both the upserted users and the minimal records must reach the known users filter
+        known_users = open_known_users()
+        if known_users is not None:
+            user_id_index = TWEET_COLUMNS.index("user_id")
+            known_users.add(
+                list(
+                    {row[0] for row in self.users}
+                    | {row[user_id_index] for row in self.tweets}
+                    | {rest_id for row in self.recommendations for rest_id in row}
+                )
+            )
+
+        self.users, self.tweets, self.recommendations = [], [], []
+
+
+def replay_archive(directory, workers=None, batch_rows=50000, endpoints=None):
+    files = find_archive_files(directory, endpoints or SUPPORTED_ENDPOINTS)
+    large_files = [path for path in files if os.path.getsize(path) > LARGE_FILE_BYTES]
+    small_files = [path for path in files if os.path.getsize(path) <= LARGE_FILE_BYTES]
+    logging.info(
+        f"Found {len(files)} archived responses in {directory}, {len(large_files)} will be streamed"
+    )
+    errors = 0
+
+    with get_db_connection() as db:
+        writer = ArchiveWriter(db)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for i, result in enumerate(
+                executor.map(parse_archive_file, small_files, chunksize=16), start=1
+            ):
+                writer.add(result)
+                errors += result["errors"]
+                if writer.pending() >= batch_rows:
+                    writer.flush()
+                    logging.info(
+                        f"Processed {i}/{len(small_files)} files: {writer.stats}"
+                    )
+
+        for path in large_files:
+            logging.info(f"Streaming {path}")
+            for result in iter_archive_results(path, batch_rows):
+                writer.add(result)
+                errors += result["errors"]
+                if writer.pending() >= batch_rows:
+                    writer.flush()
+                    logging.info(f"Streaming {path}: {writer.stats}")
+        writer.flush()
+
+    logging.info(f"Replay complete: {writer.stats}, {errors} items failed")
+    return writer.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Ingest archived GraphQL responses into the database without network access."
+    )
+    parser.add_argument("directory", type=str, help="Directory with archived responses.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of parser processes."
+    )
+    parser.add_argument(
+        "--batch_rows",
+        type=int,
+        default=50000,
+        help="Number of parsed rows to accumulate before each COPY.",
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        choices=SUPPORTED_ENDPOINTS,
+        default=SUPPORTED_ENDPOINTS,
+        help="Only ingest responses of these endpoints.",
+    )
+    args = parser.parse_args()
+
+    replay_archive(args.directory, args.workers, args.batch_rows, args.endpoints)
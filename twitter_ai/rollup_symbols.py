@@ -0,0 +1,130 @@
+import argparse
+import datetime
+import logging
+import time
+from db.database import create_rollup_watermarks_table, create_symbol_hourly_table
+from utils.config import configure_logging, Config
+from utils.db_utils import get_db_connection, get_modified_watermark
+from utils.metrics import start_metrics_server, timer
+
+configure_logging()
+
+WATERMARK_NAME = "symbol_hourly"
+CYCLE_DELAY = 60
+
+# Every hour touched by a tweet modified in (since, until] is recomputed from the tweets
+# of that hour, so edits, engagement updates and removed cashtags are all reflected.
+# The rollup and the watermark are written by a single statement and move together.
+UPDATE_SYMBOL_HOURLY_QUERY = """
+    WITH hours AS (
+        SELECT DISTINCT date_trunc('hour', created_at) AS hour
+        FROM tweets
+        WHERE lastmodified > %s AND lastmodified <= %s AND created_at IS NOT NULL
+    ),
+    counts AS (
+        SELECT
+            s.symbol,
+            h.hour,
+            COUNT(*) AS tweet_count,
+            COUNT(DISTINCT t.user_id) AS unique_users,
+            COALESCE(SUM(t.views), 0) AS sum_views,
+            COALESCE(SUM(t.likes), 0) AS sum_likes
+        FROM hours h
+        JOIN tweets t
+            ON t.created_at >= h.hour AND t.created_at < h.hour + INTERVAL '1 hour'
+        CROSS JOIN LATERAL (
+            SELECT DISTINCT upper(symbol) AS symbol FROM unnest(t.symbols) AS symbol
+        ) s
+        GROUP BY s.symbol, h.hour
+    ),
+    deleted AS (
+        DELETE FROM symbol_hourly sh
+        USING hours h
+        WHERE sh.hour = h.hour
+        AND NOT EXISTS (
+            SELECT 1 FROM counts c WHERE c.symbol = sh.symbol AND c.hour = sh.hour
+        )
+    ),
+    watermark AS (
+        INSERT INTO rollup_watermarks (name, watermark)
+        VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+    ),
+    upserted AS (
+        INSERT INTO symbol_hourly (
+            symbol, hour, tweet_count, unique_users, sum_views, sum_likes
+        )
+        SELECT symbol, hour, tweet_count, unique_users, sum_views, sum_likes FROM counts
+        ON CONFLICT (symbol, hour) DO UPDATE SET
+            tweet_count = EXCLUDED.tweet_count,
+            unique_users = EXCLUDED.unique_users,
+            sum_views = EXCLUDED.sum_views,
+            sum_likes = EXCLUDED.sum_likes
+        WHERE (
+            symbol_hourly.tweet_count, symbol_hourly.unique_users,
+            symbol_hourly.sum_views, symbol_hourly.sum_likes
+        ) IS DISTINCT FROM (
+            EXCLUDED.tweet_count, EXCLUDED.unique_users,
+            EXCLUDED.sum_views, EXCLUDED.sum_likes
+        )
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM hours), (SELECT COUNT(*) FROM upserted);
+"""
+
+
+def get_watermark(db, name):
+    rows = db.run_query(
+        "SELECT watermark FROM rollup_watermarks WHERE name = %s;", (name,)
+    )
+    return rows[0][0] if rows else None
+
+
+def update_symbol_hourly(db):
+    """
+    Brings symbol_hourly up to date with the tweets modified since the last run.
+
+    Returns:
+        tuple: The number of recomputed hours and of (symbol, hour) rows that changed.
+    """
+    since = get_watermark(db, WATERMARK_NAME) or datetime.datetime(1970, 1, 1)
+    until = get_modified_watermark(db)
+    if until <= since:
+        return 0, 0
+    hours, changed = db.run_query(
+        UPDATE_SYMBOL_HOURLY_QUERY, (since, until, WATERMARK_NAME, until)
+    )[0]
+    logging.info(
+        f"Recomputed {hours} hours of symbol_hourly for tweets modified in "
+        f"({since}, {until}], {changed} rows changed"
+    )
+    return hours, changed
+
+
+def main(once=False):
+    start_metrics_server(Config.METRICS_PORT)
+    with get_db_connection() as db:
+        create_rollup_watermarks_table(db)
+        create_symbol_hourly_table(db)
+        while True:
+            try:
+                with timer("cycle_seconds", worker="rollup_symbols"):
+                    update_symbol_hourly(db)
+            except Exception as e:
+                logging.error(f"Error occurred: {e}")
+                db.connection.rollback()
+            if once:
+                break
+            time.sleep(CYCLE_DELAY)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incrementally maintain hourly cashtag rollups in symbol_hourly."
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Run a single update and exit."
+    )
+    args = parser.parse_args()
+
+    main(args.once)
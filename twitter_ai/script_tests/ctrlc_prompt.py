@@ -24,19 +24,7 @@ def fetch_tweets_from_db(db):
             SELECT tweet_text, users.name
             FROM tweets
             JOIN users ON tweets.user_id = users.rest_id
-            WHERE 
-            length(
-                regexp_replace(
-                    regexp_replace(
-                        regexp_replace(
-                            regexp_replace(tweet_text, 'https?://[^\s]+', '', 'g'), 
-                            '@[A-Za-z0-9_]+', '', 'g'
-                        ), 
-                        '\$[A-Za-z0-9]+', '', 'g'
-                    ), 
-                    '#[A-Za-z0-9_]+', '', 'g'
-                )
-            ) > 50            
+            WHERE clean_text_length > 50
             AND users.llm_check_score > 6
             AND has_urls = False
             AND tweets.created_at > NOW() - INTERVAL '24 HOURS'
@@ -69,7 +57,7 @@ def prepare_request(tweets):
 
 def main():
     # Fetch tweets from the database
-    with get_db_connection() as db:
+    with get_db_connection(role="read") as db:
         tweets = fetch_tweets_from_db(db)
     if not tweets:
         logging.info("No tweets found that match the criteria.")
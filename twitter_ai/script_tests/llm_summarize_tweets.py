@@ -64,19 +64,24 @@ text
 
 def fetch_tweets_from_db():
     query = """
-        SELECT tweet_text 
-        FROM tweets
-        JOIN users ON tweets.user_id = users.rest_id
-        WHERE 
-        (retweeted_tweet IS NULL OR retweeted_tweet = '{}'::jsonb) 
-        AND (quoted_tweet IS NULL OR quoted_tweet = '{}'::jsonb)  
-        AND length(tweet_text) > 50
-        AND users.llm_check_score > 7
-        AND has_urls = False
-        ORDER BY tweets.created_at DESC
+        SELECT tweet_text
+        FROM (
+            SELECT DISTINCT ON (COALESCE(dup_cluster_id, tweet_id))
+                tweet_text, tweets.created_at
+            FROM tweets
+            JOIN users ON tweets.user_id = users.rest_id
+            WHERE 
+            (retweeted_tweet IS NULL OR retweeted_tweet = '{}'::jsonb) 
+            AND (quoted_tweet IS NULL OR quoted_tweet = '{}'::jsonb)  
+            AND length(tweet_text) > 50
+            AND users.llm_check_score > 7
+            AND has_urls = False
+            ORDER BY COALESCE(dup_cluster_id, tweet_id), tweets.created_at DESC
+        ) AS representatives
+        ORDER BY created_at DESC
         LIMIT 75;
     """
-    with get_db_connection() as db:
+    with get_db_connection(role="read") as db:
         return db.run_query(query)
 
 
@@ -1,15 +1,10 @@
-import json
+from utils.json_stream import iter_timeline_entries, CONNECT_TAB_INSTRUCTIONS
 
 
 # Function to load data and extract screen names
 def extract_screen_names(file_path):
-    with open(file_path, "r") as f:
-        data = json.load(f)
     screen_names = []
-    entries = data["data"]["connect_tab_timeline"]["timeline"]["instructions"][2][
-        "entries"
-    ]
-    for entry in entries:
+    for entry in iter_timeline_entries(file_path, CONNECT_TAB_INSTRUCTIONS):
         items = entry["content"]["items"]
         for item in items:
             screen_name = item["item"]["itemContent"]["user_results"]["result"][
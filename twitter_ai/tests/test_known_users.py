@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.database import Database
+from utils.db_utils import insert_user_placeholders
+from utils.known_users import KnownUsersFilter
+
+
+class TestKnownUsersFilter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "known_users.bloom")
+        self.known_users = KnownUsersFilter(self.path, capacity=10000)
+
+    def tearDown(self):
+        self.known_users.close()
+        self.directory.cleanup()
+
+    def test_no_false_negatives(self):
+        rest_ids = [str(10**15 + i) for i in range(5000)] + ["not_numeric"]
+        self.known_users.add(rest_ids)
+        self.assertTrue(self.known_users.contains(rest_ids).all())
+
+        unknown = [str(2 * 10**15 + i) for i in range(5000)]
+        false_positives = self.known_users.contains(unknown).mean()
+        self.assertLess(false_positives, 0.05)
+
+    def test_shared_between_instances(self):
+        # A second instance maps the same file, as another worker process would
+        other = KnownUsersFilter(self.path, capacity=1)
+        self.assertEqual(other.num_bits, self.known_users.num_bits)
+        self.assertFalse(other.populated)
+
+        self.known_users.add(["42"])
+        self.known_users.mark_populated()
+        self.assertTrue(other.populated)
+        self.assertEqual(other.split(["42", "43"]), (["42"], ["43"]))
+        other.close()
+
+    def test_added_after_commit(self):
+        db = Database("localhost", "crypto_twitter", "myuser", "mypassword")
+        db.connection = mock.MagicMock()
+        db.cursor = mock.MagicMock(rowcount=1)
+        with mock.patch(
+            "utils.db_utils.open_known_users", return_value=self.known_users
+        ):
+            with self.assertRaises(RuntimeError):
+                with db.pipeline():
+                    insert_user_placeholders(db, ["42"])
+                    raise RuntimeError("rolled back")
+            with db.pipeline():
+                insert_user_placeholders(db, ["43"])
+                self.assertFalse(self.known_users.contains(["43"])[0])
+
+        self.assertEqual(self.known_users.split(["42", "43"]), (["43"], ["42"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
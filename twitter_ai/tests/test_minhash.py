@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.minhash import tweet_minhash, jaccard_estimate, NUM_PERM, BANDS
+
+
+class TestMinHash(unittest.TestCase):
+    def setUp(self):
+        self.text = (
+            "$PEPE is about to explode!! Join the presale now, 100x guaranteed, "
+            "don't miss out fam https://t.co/abc"
+        )
+
+    def test_near_duplicates_share_a_band(self):
+        minhash, bands = tweet_minhash(self.text)
+        copy_minhash, copy_bands = tweet_minhash(
+            self.text.upper().replace("fam", "frens") + " https://t.co/other"
+        )
+        self.assertEqual(len(minhash), NUM_PERM * 4)
+        self.assertEqual(len(bands), BANDS)
+        self.assertGreater(jaccard_estimate(minhash, copy_minhash), 0.7)
+        self.assertTrue(set(bands) & set(copy_bands))
+
+    def test_different_tweets(self):
+        minhash, bands = tweet_minhash(self.text)
+        other_minhash, other_bands = tweet_minhash(
+            "Shipping the new staking dashboard today, thread on the design below"
+        )
+        self.assertLess(jaccard_estimate(minhash, other_minhash), 0.2)
+        self.assertFalse(set(bands) & set(other_bands))
+
+    def test_links_only(self):
+        self.assertEqual(tweet_minhash("https://t.co/abc"), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
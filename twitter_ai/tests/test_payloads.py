@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.payloads import PayloadGenerator, generate
+from utils.common_utils import iter_timeline_tweet_results, extract_users_and_ids
+from utils.db_utils import build_tweet_params
+from replay_archive import find_archive_files, parse_archive_file
+
+
+class TestPayloadParsing(unittest.TestCase):
+    def setUp(self):
+        self.generator = PayloadGenerator(500, seed=1, malformed_rate=0.1)
+
+    def test_user_tweets_page(self):
+        tweet_ids = set()
+        for page in range(20):
+            response = self.generator.user_tweets_page(page, page * 20)
+            for tweet_results in iter_timeline_tweet_results(response):
+                try:
+                    params = build_tweet_params(tweet_results)
+                except KeyError:
+                    continue
+                tweet_ids.add(params[0])
+                if "note_tweet" in tweet_results:
+                    # The full text of note tweets wins over the truncated legacy text
+                    self.assertFalse(params[1].endswith("…"))
+
+        self.assertGreater(self.generator.expected["malformed"], 0)
+        self.assertEqual(tweet_ids, self.generator.expected["tweets"])
+
+    def test_connect_tab_page(self):
+        response = self.generator.connect_tab_page(count=50)
+        entries = response["data"]["connect_tab_timeline"]["timeline"]["instructions"][
+            2
+        ]["entries"]
+        users, rest_ids = extract_users_and_ids(entries)
+
+        self.assertEqual(set(rest_ids), self.generator.expected["users"])
+        self.assertEqual(len(users), len(rest_ids))
+
+    def test_replay_generated_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            expected = generate(directory, 200, 5, 2, 2, malformed_rate=0.1, seed=2)
+            results = [parse_archive_file(path) for path in find_archive_files(directory)]
+
+        tweet_ids = {row[0] for result in results for row in result["tweets"]}
+        user_ids = {row[0] for result in results for row in result["users"]}
+        self.assertEqual(tweet_ids, expected["tweets"])
+        self.assertTrue(expected["users"] <= user_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.database import Database
+from db.query_stats import QueryStats
+
+
+class TestSlowQueryInPipeline(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(
+            host="localhost",
+            database="crypto_twitter",
+            user="myuser",
+            password="mypassword",
+        )
+        self.db.connection = mock.MagicMock()
+        self.db.cursor = mock.MagicMock(rowcount=1)
+        self.query_stats = QueryStats(slow_ms=0, explain=True)
+
+    def test_pipeline_keeps_earlier_statements(self):
+        with mock.patch(
+            "db.database.get_query_stats", return_value=self.query_stats
+        ):
+            with self.db.pipeline():
+                self.db.execute("INSERT INTO tweets (tweet_id) VALUES (%s);", ("1",))
+                self.db.execute("UPDATE users SET tweets_parsed = TRUE;")
+
+        self.db.connection.rollback.assert_not_called()
+        self.db.connection.commit.assert_called_once()
+        self.assertTrue(
+            all(stats["plan"] is None for stats in self.query_stats.report())
+        )
+
+    def test_explain_outside_pipeline(self):
+        cursor = self.db.connection.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [("Seq Scan on users",)]
+        with mock.patch(
+            "db.database.get_query_stats", return_value=self.query_stats
+        ):
+            self.db.run_query("SELECT rest_id FROM users;")
+
+        self.assertEqual(self.query_stats.report()[0]["plan"], "Seq Scan on users")
+        self.db.connection.rollback.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+import os
+import sys
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.text_utils import clean_tweet_text
+from utils.common_utils import remove_https_links
+
+
+class TestCleanTweetText(unittest.TestCase):
+    def test_strips_entities(self):
+        text = "gm @vitalik_eth, $ETH to the moon #crypto #web3 https://t.co/abc?x=#tag"
+        self.assertEqual(clean_tweet_text(text), "gm , to the moon")
+
+    def test_empty_text(self):
+        self.assertEqual(clean_tweet_text(None), "")
+        self.assertEqual(clean_tweet_text("https://t.co/abc @someone"), "")
+
+    def test_remove_https_links(self):
+        self.assertEqual(
+            remove_https_links("read https://t.co/abc now http://keep.me"),
+            "read  now http://keep.me",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import os
+import sys
+import pandas as pd
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.user_features import (
+    compute_user_features,
+    DEFAULT_TWEET_INTERVAL,
+    MAX_TWEET_INTERVAL,
+)
+
+
+class TestComputeUserFeatures(unittest.TestCase):
+    def setUp(self):
+        self.now = pd.Timestamp("2024-06-01 12:00:00")
+        self.users = pd.DataFrame(
+            {
+                "rest_id": ["1", "2", "3"],
+                "followers_count": [200, 0, 50],
+                "friends_count": [180, 10, 100],
+                "tweets_parsed_last_timestamp": pd.to_datetime(
+                    [None, None, "2024-06-01 11:00:00"]
+                ),
+            }
+        )
+        created_at = [self.now - pd.Timedelta(hours=h) for h in range(10)]
+        self.tweets = pd.DataFrame(
+            {
+                "user_id": ["1"] * 10 + ["3"] * 2,
+                "created_at": created_at + created_at[:2],
+                "views": [100] * 10 + [10, 30],
+                "likes": [1] * 10 + [0, 2],
+            }
+        )
+
+    def test_compute_user_features(self):
+        features = compute_user_features(self.users, self.tweets, now=self.now)
+        features = features.set_index("rest_id")
+
+        self.assertAlmostEqual(features.loc["1", "follow_ratio"], 0.9)
+        self.assertTrue(pd.isna(features.loc["2", "follow_ratio"]))
+        self.assertEqual(features.loc["1", "recent_tweet_count"], 10)
+        self.assertEqual(features.loc["1", "tweets_48h"], 10)
+        # 9 hours between the oldest and newest tweet spread over 10 tweets
+        self.assertAlmostEqual(features.loc["1", "tweet_interval"], 9 * 3600 / 10)
+        self.assertEqual(features.loc["3", "tweet_interval"], DEFAULT_TWEET_INTERVAL)
+        self.assertAlmostEqual(features.loc["3", "avg_views"], 20)
+        # No recent tweets, the SQL CASE falls through to LEAST(NULL, max) = max
+        self.assertEqual(features.loc["2", "tweet_interval"], MAX_TWEET_INTERVAL)
+        self.assertEqual(features.loc["2", "recent_tweet_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
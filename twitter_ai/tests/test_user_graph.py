@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Ensure that the path to the utilities and other dependencies is available
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.user_graph import Graph, pagerank, compute_graph_metrics
+
+
+class TestUserGraph(unittest.TestCase):
+    def setUp(self):
+        # A 3-cycle 10 -> 20 -> 30 -> 10 with a duplicate edge, plus 50 -> 40 and 60 -> 40
+        self.sources = np.array([10, 20, 30, 10, 50, 60], dtype=np.int64)
+        self.targets = np.array([20, 30, 10, 20, 40, 40], dtype=np.int64)
+
+    def test_csr(self):
+        graph = Graph.from_edges(self.sources, self.targets)
+        self.assertEqual(graph.ids.tolist(), [10, 20, 30, 40, 50, 60])
+        self.assertEqual(graph.indptr.tolist(), [0, 1, 2, 3, 3, 4, 5])
+        self.assertEqual(graph.indices.tolist(), [1, 2, 0, 3, 3])
+
+    def test_pagerank(self):
+        ranks = pagerank(Graph.from_edges(self.sources, self.targets))
+        self.assertAlmostEqual(ranks.sum(), 1.0)
+        self.assertAlmostEqual(ranks[0], ranks[1])
+        self.assertAlmostEqual(ranks[1], ranks[2])
+        self.assertAlmostEqual(ranks[4], ranks[5])
+        self.assertGreater(ranks[3], ranks[4])
+
+    def test_compute_graph_metrics(self):
+        metrics = compute_graph_metrics(self.sources, self.targets)
+        self.assertEqual(metrics["in_degree"].tolist(), [1, 1, 1, 2, 0, 0])
+        self.assertEqual(metrics["out_degree"].tolist(), [1, 1, 1, 0, 1, 1])
+        self.assertEqual(metrics["component_id"].tolist(), [10, 10, 10, 40, 40, 40])
+        self.assertEqual(metrics["component_size"].tolist(), [3, 3, 3, 3, 3, 3])
+
+    def test_empty_graph(self):
+        empty = np.array([], dtype=np.int64)
+        metrics = compute_graph_metrics(empty, empty)
+        self.assertEqual(len(metrics["rest_id"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,6 @@
 import logging
 from colorama import Fore, Style
 import time
-import re
 
 # common_utils.py
 
@@ -11,6 +10,8 @@ from utils.db_utils import (
     insert_user_recommendations,
     update_user_recommendations_status,
 )
+from utils.response_archive import archive_response
+from utils.text_utils import HTTPS_LINK_PATTERN
 
 
 def process_and_insert_users(db, scraper, user_ids):
@@ -23,6 +24,9 @@ def process_and_insert_users(db, scraper, user_ids):
         print("No user data fetched from Twitter.")
         return 0
 
+    for users_page in users_data:
+        archive_response(db, "UsersByRestIds", users_page)
+
     # Extract user data
     users = []
     for user_data in users_data[0]["data"]["users"]:
@@ -99,61 +103,122 @@ def save_users_recommendations_by_ids(db, scraper, user_ids):
     return new_users_count
 
 
-def save_tweets_to_db(db, all_pages):
-    total_inserted_tweets = 0  # Initialize a counter for inserted tweets
+def iter_timeline_tweet_results(tweets):
+    """
+    Yields the tweet results of a single UserTweets response in timeline order.
+
+    Parameters:
+    tweets (dict): A UserTweets GraphQL response.
+
+    Yields:
+    dict: The tweet result of every tweet entry, unwrapped from "tweet" containers.
+    """
+    try:
+        timeline_v2 = tweets["data"]["user"]["result"]["timeline_v2"]
+    except KeyError as e:
+        logging.error(
+            f"{Fore.RED}KeyError: {e} - 'timeline_v2' data is missing{Style.RESET_ALL}"
+        )
+        return
+
+    try:
+        instructions = timeline_v2["timeline"]["instructions"]
+    except KeyError as e:
+        logging.error(
+            f"{Fore.RED}KeyError: {e} - 'instructions' data is missing{Style.RESET_ALL}"
+        )
+        return
+
+    for instruction in instructions:
+        if instruction["type"] == "TimelineAddEntries":
+            for entry in instruction["entries"]:
+                tweet_results = get_entry_tweet_results(entry)
+                if tweet_results is not None:
+                    yield tweet_results
+
+
+def get_entry_tweet_results(entry):
+    """
+    Returns the tweet result of a timeline entry, or None if the entry holds no valid tweet.
+    """
+    if not entry["entryId"].startswith("tweet"):
+        return None
+    try:
+        tweet_results = entry["content"]["itemContent"]["tweet_results"]["result"]
+    except KeyError as e:
+        logging.error(
+            f"{Fore.RED}KeyError: {e} - tweet data: {entry}{Style.RESET_ALL}"
+        )
+        return None
+
+    if "rest_id" in tweet_results:
+        return tweet_results
+    if "tweet" in tweet_results:
+        return tweet_results["tweet"]
+    logging.error(f"{Fore.RED}rest_id not in tweet data: {entry}{Style.RESET_ALL}")
+    return None
+
 
+def get_page_user_id(tweets):
+    """
+    Returns the timeline owner of a UserTweets response, taken from its first tweet.
+    """
+    try:
+        instructions = tweets["data"]["user"]["result"]["timeline_v2"]["timeline"][
+            "instructions"
+        ]
+    except (KeyError, TypeError):
+        return None
+
+    for instruction in instructions:
+        for entry in instruction.get("entries", []):
+            if not entry.get("entryId", "").startswith("tweet"):
+                continue
+            try:
+                tweet_results = entry["content"]["itemContent"]["tweet_results"][
+                    "result"
+                ]
+                return tweet_results.get("tweet", tweet_results)["legacy"]["user_id_str"]
+            except (KeyError, TypeError):
+                continue
+    return None
+
+
+def collect_tweet_results(db, all_pages):
+    """
+    Archives the UserTweets pages and returns the tweet results they contain.
+    """
+    tweet_results_list = []
     for page in all_pages:
         if not isinstance(page, list):
             page = [page]
         for tweets in page:
-            try:
-                timeline_v2 = tweets["data"]["user"]["result"]["timeline_v2"]
-            except KeyError as e:
-                logging.error(
-                    f"{Fore.RED}KeyError: {e} - 'timeline_v2' data is missing{Style.RESET_ALL}"
-                )
-                continue
+            archive_response(db, "UserTweets", tweets, get_page_user_id(tweets))
+            tweet_results_list.extend(iter_timeline_tweet_results(tweets))
+    return tweet_results_list
 
-            try:
-                instructions = timeline_v2["timeline"]["instructions"]
-            except KeyError as e:
-                logging.error(
-                    f"{Fore.RED}KeyError: {e} - 'instructions' data is missing{Style.RESET_ALL}"
-                )
-                continue
 
-            for instruction in instructions:
-                if instruction["type"] == "TimelineAddEntries":
-                    for entry in instruction["entries"]:
-                        if entry["entryId"].startswith("tweet"):
-                            try:
-                                tweet_results = entry["content"]["itemContent"][
-                                    "tweet_results"
-                                ]["result"]
-                                if "rest_id" in tweet_results:
-                                    inserted_tweets = insert_tweets(db, tweet_results)
-                                    total_inserted_tweets += inserted_tweets
-                                elif "tweet" in tweet_results:
-                                    inserted_tweets = insert_tweets(
-                                        db, tweet_results["tweet"]
-                                    )
-                                    total_inserted_tweets += inserted_tweets
-                                else:
-                                    logging.error(
-                                        f"{Fore.RED}rest_id not in tweet data: {entry}{Style.RESET_ALL}"
-                                    )
-                            except KeyError as e:
-                                logging.error(
-                                    f"{Fore.RED}KeyError: {e} - tweet data: {entry}{Style.RESET_ALL}"
-                                )
-                            except Exception as e:
-                                logging.error(
-                                    f"{Fore.RED}Unexpected error: {e} - tweet data: {entry}{Style.RESET_ALL}"
-                                )
+def save_tweet_results(db, tweet_results_list):
+    total_inserted_tweets = 0  # Initialize a counter for inserted tweets
+
+    for tweet_results in tweet_results_list:
+        try:
+            inserted_tweets = insert_tweets(db, tweet_results)
+            total_inserted_tweets += inserted_tweets
+        except Exception as e:
+            logging.error(
+                f"{Fore.RED}Unexpected error: {e} - tweet data: {tweet_results}{Style.RESET_ALL}"
+            )
+            # The failed upsert must not abort the transaction of the next tweets
+            db.connection.rollback()
 
     return total_inserted_tweets  # Return the total number of inserted tweets
 
 
+def save_tweets_to_db(db, all_pages):
+    return save_tweet_results(db, collect_tweet_results(db, all_pages))
+
+
 def fetch_tweets_for_users(
     scraper, user_ids, limit_pages=1, max_retries=8, backoff_factor=16
 ):
@@ -192,10 +257,5 @@ def remove_https_links(input_str):
     Returns:
     str: The input string with all https:// links removed.
     """
-    # Regex pattern to match https:// links
-    pattern = r"https:\/\/\S+"
-
     # Substitute all https:// links with an empty string
-    result = re.sub(pattern, "", input_str)
-
-    return result
+    return HTTPS_LINK_PATTERN.sub("", input_str)
@@ -21,11 +21,42 @@ class Config:
     DB_NAME = os.getenv("DB_NAME", "crypto_twitter")
     DB_USER = os.getenv("DB_USER", "myuser")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "mypassword")
+    DB_BACKEND = os.getenv("DB_BACKEND", "psycopg2")
+    DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+    # Default to the primary's database and credentials when not set
+    DB_REPLICA_NAME = os.getenv("DB_REPLICA_NAME")
+    DB_REPLICA_USER = os.getenv("DB_REPLICA_USER")
+    DB_REPLICA_PASSWORD = os.getenv("DB_REPLICA_PASSWORD")
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))
+    DB_QUERY_STATS = os.getenv("DB_QUERY_STATS", "false").lower() == "true"
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+    DB_EXPLAIN_SLOW_QUERIES = (
+        os.getenv("DB_EXPLAIN_SLOW_QUERIES", "false").lower() == "true"
+    )
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     COOKIES_DIR = os.getenv("COOKIES_DIR")
     ANTI_CAPTCHA_KEY = os.getenv("ANTI_CAPTCHA_KEY")
     HF_TOKEN = os.getenv("HF_TOKEN")
+    EMBEDDING_PREFILTER = os.getenv("EMBEDDING_PREFILTER", "false").lower() == "true"
+    RESPONSE_ARCHIVE_DIR = os.getenv("RESPONSE_ARCHIVE_DIR")
+    METRICS_PORT = os.getenv("METRICS_PORT")
+    KNOWN_USERS_FILTER_PATH = os.getenv("KNOWN_USERS_FILTER_PATH")
+    KNOWN_USERS_FILTER_CAPACITY = int(
+        os.getenv("KNOWN_USERS_FILTER_CAPACITY", "10000000")
+    )
+    EMBEDDING_MODEL = os.getenv(
+        "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+    )
+    # Topic similarity at or below / at or above which users are scored without the LLM
+    EMBEDDING_NEGATIVE_THRESHOLD = float(
+        os.getenv("EMBEDDING_NEGATIVE_THRESHOLD", "0.2")
+    )
+    EMBEDDING_POSITIVE_THRESHOLD = float(
+        os.getenv("EMBEDDING_POSITIVE_THRESHOLD", "0.5")
+    )
+    EMBEDDING_NEGATIVE_SCORE = float(os.getenv("EMBEDDING_NEGATIVE_SCORE", "0.0"))
+    EMBEDDING_POSITIVE_SCORE = float(os.getenv("EMBEDDING_POSITIVE_SCORE", "7.0"))
 
     @staticmethod
     def get_twitter_accounts():
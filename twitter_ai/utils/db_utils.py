@@ -1,22 +1,167 @@
 import os
+import io
+import csv
 import json
 import datetime
-from db.database import Database
-from utils.config import configure_logging, logging
+from db.database import Database, ReplicaDatabase
+from utils.config import configure_logging, logging, Config
+from utils.metrics import timer, inc
+from utils.known_users import get_known_users, open_known_users
+from utils.minhash import tweet_minhash
+from utils.text_utils import clean_tweet_text
 
 configure_logging()
 
 
-def get_db_connection():
+def get_db_connection(role="write"):
+    """
+    Returns a database connection for the given role.
+
+    Args:
+        role (str): "write" connects to the primary. "read" connects to the replica set in
+            DB_REPLICA_HOST when configured, falling back to the primary if the replica is
+            unreachable or lags more than DB_REPLICA_MAX_LAG seconds. Use it only for
+            read-only queries.
+
+    DB_BACKEND=psycopg3 selects the pooled, pipelined psycopg3 implementation.
+    """
     db_params = {
         "host": os.getenv("DB_HOST", "localhost"),
         "database": os.getenv("DB_NAME", "crypto_twitter"),
         "user": os.getenv("DB_USER", "myuser"),
         "password": os.getenv("DB_PASSWORD", "mypassword"),
     }
+    if role == "read" and Config.DB_REPLICA_HOST:
+        replica_params = {
+            "host": Config.DB_REPLICA_HOST,
+            "database": Config.DB_REPLICA_NAME or db_params["database"],
+            "user": Config.DB_REPLICA_USER or db_params["user"],
+            "password": Config.DB_REPLICA_PASSWORD or db_params["password"],
+        }
+        replica_class = ReplicaDatabase
+        if Config.DB_BACKEND == "psycopg3":
+            from db.database_psycopg3 import Psycopg3ReplicaDatabase as replica_class
+        return replica_class(
+            **replica_params,
+            primary_params=db_params,
+            max_lag=Config.DB_REPLICA_MAX_LAG,
+        )
+    if Config.DB_BACKEND == "psycopg3":
+        from db.database_psycopg3 import Psycopg3Database
+
+        return Psycopg3Database(**db_params)
     return Database(**db_params)
 
 
+def get_async_db_connection(max_size=10):
+    """
+    Returns an AsyncDatabase for asyncio components, to be used with `async with`.
+    """
+    from db.database_async import AsyncDatabase
+
+    return AsyncDatabase(
+        host=os.getenv("DB_HOST", "localhost"),
+        database=os.getenv("DB_NAME", "crypto_twitter"),
+        user=os.getenv("DB_USER", "myuser"),
+        password=os.getenv("DB_PASSWORD", "mypassword"),
+        max_size=max_size,
+    )
+
+
+# Kept between the read bound and now, covers the lag of a replica used for the reads
+MODIFIED_SAFETY_LAG = 60
+
+
+def get_modified_watermark(db, safety_lag=MODIFIED_SAFETY_LAG):
+    """
+    Returns the timestamp up to which rows stamped with CURRENT_TIMESTAMP (lastmodified,
+    created_at defaults) can be read incrementally without missing any of them.
+
+    CURRENT_TIMESTAMP is the start time of the transaction, so a transaction that is
+    still open can commit rows stamped well before now. The bound is kept before the
+    start of the oldest open transaction of the database and `safety_lag` seconds
+    behind now.
+
+    Must run on the primary: a replica does not list the transactions of the primary in
+    pg_stat_activity. Transactions of other roles are only visible to superusers and
+    members of pg_read_all_stats, so grant it if the workers use other roles.
+
+    Args:
+        db (Database): A connection to the primary.
+        safety_lag (int): Minimum distance from now, in seconds.
+
+    Returns:
+        datetime.datetime: The upper bound, inclusive.
+    """
+    query = """
+        SELECT LEAST(
+            LOCALTIMESTAMP - INTERVAL '1 second' * %s,
+            (
+                SELECT MIN(xact_start)::timestamp - INTERVAL '1 microsecond'
+                FROM pg_stat_activity
+                WHERE datname = current_database()
+                AND pid <> pg_backend_pid()
+                AND xact_start IS NOT NULL
+            )
+        );
+    """
+    return db.run_query(query, (safety_lag,))[0][0]
+
+
+def to_pg_array(values):
+    """
+    Formats a list of strings as a Postgres array literal suitable for COPY.
+    """
+    escaped = (
+        '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for value in values
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        return to_pg_array(value)
+    if isinstance(value, bytes):
+        return "\\x" + value.hex()
+    return value
+
+
+def copy_rows(db, table, columns, rows):
+    """
+    Loads rows into a table with COPY FROM STDIN in CSV format.
+
+    None is written as NULL, lists are converted to Postgres array literals.
+    The caller is responsible for committing the transaction.
+
+    Args:
+        db (Database): The database connection object.
+        table (str): The target table name.
+        columns (list): Column names matching the order of values in each row.
+        rows (iterable): Tuples of values.
+
+    Returns:
+        int: The number of copied rows.
+    """
+    if hasattr(db, "copy_records"):
+        return db.copy_records(table, columns, rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow([format_copy_value(value) for value in row])
+        count += 1
+    buffer.seek(0)
+    db.cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+    return count
+
+
 def insert_action(
     db,
     action_account_id,
@@ -46,14 +191,44 @@ def insert_action(
     db.run_query(query, params)
 
 
-def insert_users(db, user_results):
-    query = """
-        INSERT INTO users (
-            rest_id, username, name, profile_image_url_https, profile_banner_url, description, location,
-            followers_count, friends_count, favourites_count, statuses_count, created_at, is_blue_verified,
-            is_translator, verified, professional_type, category, tweets_parsed, tweets_parsed_last_timestamp,
-            recommendations_pulled, recommendations_pulled_last_timestamp
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+def changed_condition(table, columns):
+    """
+    Returns the ON CONFLICT ... WHERE condition that lets an upsert update the stored row only
+    when one of `columns` differs, so re-crawling an unchanged row writes no new tuple version.
+    """
+    stored = ", ".join(f"{table}.{column}" for column in columns)
+    excluded = ", ".join(f"EXCLUDED.{column}" for column in columns)
+    return f"({stored}) IS DISTINCT FROM ({excluded})"
+
+
+USER_COLUMNS = [
+    "rest_id",
+    "username",
+    "name",
+    "profile_image_url_https",
+    "profile_banner_url",
+    "description",
+    "location",
+    "followers_count",
+    "friends_count",
+    "favourites_count",
+    "statuses_count",
+    "created_at",
+    "is_blue_verified",
+    "is_translator",
+    "verified",
+    "professional_type",
+    "category",
+    "tweets_parsed",
+    "tweets_parsed_last_timestamp",
+    "recommendations_pulled",
+    "recommendations_pulled_last_timestamp",
+]
+
+# Columns refreshed by a re-crawl, the crawl state columns are owned by the workers
+USER_TRACKED_COLUMNS = USER_COLUMNS[1:17]
+
+USERS_ON_CONFLICT = f"""
         ON CONFLICT (rest_id) DO UPDATE SET
             username = EXCLUDED.username,
             name = EXCLUDED.name,
@@ -71,73 +246,46 @@ def insert_users(db, user_results):
             verified = EXCLUDED.verified,
             professional_type = EXCLUDED.professional_type,
             category = EXCLUDED.category,
-            lastmodified = CURRENT_TIMESTAMP;
-    """
-    if not isinstance(user_results, list):
-        user_results = [user_results]
-
-    params_list = []
-    omitted_rows = 0
-
-    for user_result in user_results:
-        try:
-            legacy = user_result.get("legacy", {})
-            professional = user_result.get("professional", {})
-            category_name = ""
-            if (
-                professional.get("category")
-                and isinstance(professional.get("category"), list)
-                and professional["category"]
-            ):
-                if isinstance(professional["category"][0], dict):
-                    category_name = professional["category"][0].get("name", "")
-
-            params = (
-                user_result.get("rest_id", ""),
-                legacy.get("screen_name", ""),
-                legacy.get("name", ""),
-                legacy.get("profile_image_url_https", ""),
-                legacy.get("profile_banner_url", ""),
-                legacy.get("description", ""),
-                legacy.get("location", ""),
-                legacy.get("followers_count", 0),
-                legacy.get("friends_count", 0),
-                legacy.get("favourites_count", 0),
-                legacy.get("statuses_count", 0),
-                legacy.get("created_at", None),
-                user_result.get("is_blue_verified", False),
-                legacy.get("is_translator", False),
-                legacy.get("verified", False),
-                professional.get("professional_type", ""),
-                category_name,
-                False,  # Default value for tweets_parsed
-                None,  # Default value for tweets_parsed_last_timestamp
-                False,  # Default value for recommendations_pulled
-                None,  # Default value for recommendations_pulled_last_timestamp
-            )
-            params_list.append(params)
-        except KeyError as e:
-            logging.error(f"KeyError: {e}. Omitting row for user_result: {user_result}")
-            omitted_rows += 1
-        except Exception as e:
-            logging.error(
-                f"Unexpected error: {e}. Omitting row for user_result: {user_result}"
-            )
-            omitted_rows += 1
-
-    db.run_insert_query(query, params_list)
-    if omitted_rows > 0:
-        logging.info(f"Omitted {omitted_rows} rows due to missing keys or errors.")
-    return db.cursor.rowcount
-
-
-def insert_tweets(db, tweet_results_list):
-    query = """
-        INSERT INTO tweets (
-            tweet_id, tweet_text, likes, retweets, replies, quotes, bookmarks, created_at, views, has_media,
-            has_user_mentions, users_mentioned, has_urls, has_hashtags, has_symbols, symbols, user_id,
-            possibly_sensitive, lang, source, media_urls, media_types, media_sizes, retweeted_tweet, quoted_tweet, card
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            lastmodified = CURRENT_TIMESTAMP
+        WHERE {changed_condition("users", USER_TRACKED_COLUMNS)}
+"""
+
+TWEET_COLUMNS = [
+    "tweet_id",
+    "tweet_text",
+    "likes",
+    "retweets",
+    "replies",
+    "quotes",
+    "bookmarks",
+    "created_at",
+    "views",
+    "has_media",
+    "has_user_mentions",
+    "users_mentioned",
+    "has_urls",
+    "has_hashtags",
+    "has_symbols",
+    "symbols",
+    "user_id",
+    "possibly_sensitive",
+    "lang",
+    "source",
+    "media_urls",
+    "media_types",
+    "media_sizes",
+    "retweeted_tweet",
+    "quoted_tweet",
+    "card",
+    "minhash",
+    "lsh_bands",
+    "clean_text",
+    "clean_text_length",
+]
+
+TWEET_TRACKED_COLUMNS = TWEET_COLUMNS[1:]
+
+TWEETS_ON_CONFLICT = f"""
         ON CONFLICT (tweet_id) DO UPDATE SET
             tweet_text = EXCLUDED.tweet_text,
             likes = EXCLUDED.likes,
@@ -164,7 +312,211 @@ def insert_tweets(db, tweet_results_list):
             retweeted_tweet = EXCLUDED.retweeted_tweet,
             quoted_tweet = EXCLUDED.quoted_tweet,
             card = EXCLUDED.card,
-            lastmodified = CURRENT_TIMESTAMP;
+            minhash = EXCLUDED.minhash,
+            lsh_bands = EXCLUDED.lsh_bands,
+            clean_text = EXCLUDED.clean_text,
+            clean_text_length = EXCLUDED.clean_text_length,
+            lastmodified = CURRENT_TIMESTAMP
+        WHERE {changed_condition("tweets", TWEET_TRACKED_COLUMNS)}
+"""
+
+
+INSERT_USERS_QUERY = f"""
+        INSERT INTO users ({", ".join(USER_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(USER_COLUMNS))})
+        {USERS_ON_CONFLICT}
+        RETURNING (xmax = 0) AS inserted;
+"""
+
+INSERT_TWEETS_QUERY = f"""
+        INSERT INTO tweets ({", ".join(TWEET_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(TWEET_COLUMNS))})
+        {TWEETS_ON_CONFLICT}
+        RETURNING (xmax = 0) AS inserted;
+"""
+
+Database.register_prepared("insert_users", INSERT_USERS_QUERY)
+Database.register_prepared("insert_tweets", INSERT_TWEETS_QUERY)
+
+
+def build_user_params(user_result):
+    """
+    Converts a GraphQL user result into a tuple of values ordered as USER_COLUMNS.
+    """
+    legacy = user_result.get("legacy", {})
+    professional = user_result.get("professional", {})
+    category_name = ""
+    if (
+        professional.get("category")
+        and isinstance(professional.get("category"), list)
+        and professional["category"]
+    ):
+        if isinstance(professional["category"][0], dict):
+            category_name = professional["category"][0].get("name", "")
+
+    return (
+        user_result.get("rest_id", ""),
+        legacy.get("screen_name", ""),
+        legacy.get("name", ""),
+        legacy.get("profile_image_url_https", ""),
+        legacy.get("profile_banner_url", ""),
+        legacy.get("description", ""),
+        legacy.get("location", ""),
+        legacy.get("followers_count", 0),
+        legacy.get("friends_count", 0),
+        legacy.get("favourites_count", 0),
+        legacy.get("statuses_count", 0),
+        legacy.get("created_at", None),
+        user_result.get("is_blue_verified", False),
+        legacy.get("is_translator", False),
+        legacy.get("verified", False),
+        professional.get("professional_type", ""),
+        category_name,
+        False,  # Default value for tweets_parsed
+        None,  # Default value for tweets_parsed_last_timestamp
+        False,  # Default value for recommendations_pulled
+        None,  # Default value for recommendations_pulled_last_timestamp
+    )
+
+
+def build_tweet_params(tweet_results):
+    """
+    Converts a GraphQL tweet result into a tuple of values ordered as TWEET_COLUMNS.
+    """
+    legacy = tweet_results["legacy"]
+    media_entities = legacy.get("extended_entities", {}).get("media", [])
+
+    media_urls = [media["media_url_https"] for media in media_entities]
+    media_types = [media["type"] for media in media_entities]
+    media_sizes = {media["media_key"]: media["sizes"] for media in media_entities}
+    tweet_text = (
+        tweet_results.get("note_tweet", {})
+        .get("note_tweet_results", {})
+        .get("result", {})
+        .get("text", legacy.get("full_text", ""))
+    )
+    clean_text = clean_tweet_text(tweet_text)
+
+    return (
+        tweet_results["rest_id"],
+        tweet_text,
+        legacy.get("favorite_count", 0),
+        legacy.get("retweet_count", 0),
+        legacy.get("reply_count", 0),
+        legacy.get("quote_count", 0),
+        legacy.get("bookmark_count", 0),
+        legacy.get("created_at", None),
+        tweet_results.get("views", {}).get("count", 0),
+        "media" in legacy.get("extended_entities", {}),
+        bool(legacy.get("entities", {}).get("user_mentions", [])),
+        [
+            mention["id_str"]
+            for mention in legacy.get("entities", {}).get("user_mentions", [])
+        ],
+        bool(legacy.get("entities", {}).get("urls", [])),
+        bool(legacy.get("entities", {}).get("hashtags", [])),
+        bool(legacy.get("entities", {}).get("symbols", [])),
+        [symbol["text"] for symbol in legacy.get("entities", {}).get("symbols", [])],
+        legacy.get("user_id_str", ""),
+        legacy.get("possibly_sensitive", False),
+        legacy.get("lang", ""),
+        tweet_results.get("source", ""),
+        media_urls,  # Already a list
+        media_types,  # Already a list
+        json.dumps(media_sizes),
+        json.dumps(legacy.get("retweeted_status_result", {})),
+        json.dumps(tweet_results.get("quoted_status_result", {})),
+        json.dumps(tweet_results.get("card", {})),
+        *tweet_minhash(tweet_text),
+        clean_text,
+        len(clean_text),
+    )
+
+
+def run_upsert(db, name, table, params_list):
+    """
+    Runs a registered upsert and splits its rows into inserted, updated and unchanged ones.
+    Unchanged rows are skipped by the ON CONFLICT condition and return nothing.
+    """
+    with timer("db_query_seconds", query=name):
+        returned = db.run_prepared(name, params_list, returning=True)
+    inserted = sum(1 for row in returned if row[0])
+    counts = {
+        "inserted": inserted,
+        "updated": len(returned) - inserted,
+        "unchanged": len(params_list) - len(returned),
+    }
+    for outcome, count in counts.items():
+        inc("rows_upserted_total", count, table=table, outcome=outcome)
+    return counts
+
+
+def insert_users(db, user_results, return_counts=False):
+    """
+    Upserts GraphQL user results.
+
+    Returns:
+        int: The number of valid rows (inserted, updated or unchanged), or with
+        `return_counts` a dict with the inserted, updated, unchanged and omitted counts.
+    """
+    if not isinstance(user_results, list):
+        user_results = [user_results]
+
+    params_list = []
+    omitted_rows = 0
+
+    for user_result in user_results:
+        try:
+            params_list.append(build_user_params(user_result))
+        except KeyError as e:
+            logging.error(f"KeyError: {e}. Omitting row for user_result: {user_result}")
+            omitted_rows += 1
+        except Exception as e:
+            logging.error(
+                f"Unexpected error: {e}. Omitting row for user_result: {user_result}"
+            )
+            omitted_rows += 1
+
+    counts = run_upsert(db, "insert_users", "users", params_list)
+    known_users = open_known_users()
+    if known_users is not None:
+        rest_ids = [params[0] for params in params_list]
+        db.after_commit(lambda: known_users.add(rest_ids))
+    if omitted_rows > 0:
+        logging.info(f"Omitted {omitted_rows} rows due to missing keys or errors.")
+    if return_counts:
+        return dict(counts, omitted=omitted_rows)
+    return len(params_list)
+
+
+def insert_user_placeholders(db, rest_ids):
+    """
+    Inserts bare records for users referenced by tweets, so that the tweets satisfy the
+    foreign key. Users that already exist keep their profile.
+    """
+    rest_ids = [rest_id for rest_id in rest_ids if rest_id]
+    if not rest_ids:
+        return 0
+    query = """
+        INSERT INTO users (rest_id)
+        SELECT unnest(%s::varchar[])
+        ON CONFLICT (rest_id) DO NOTHING;
+    """
+    db.run_query(query, (rest_ids,))
+    inserted = db.cursor.rowcount
+    known_users = open_known_users()
+    if known_users is not None:
+        db.after_commit(lambda: known_users.add(rest_ids))
+    return inserted
+
+
+def insert_tweets(db, tweet_results_list, return_counts=False):
+    """
+    Upserts GraphQL tweet results.
+
+    Returns:
+        int: The number of valid rows (inserted, updated or unchanged), or with
+        `return_counts` a dict with the inserted, updated, unchanged and omitted counts.
     """
     if not isinstance(tweet_results_list, list):
         tweet_results_list = [tweet_results_list]
@@ -174,53 +526,7 @@ def insert_tweets(db, tweet_results_list):
 
     for tweet_results in tweet_results_list:
         try:
-            legacy = tweet_results["legacy"]
-            media_entities = legacy.get("extended_entities", {}).get("media", [])
-
-            media_urls = [media["media_url_https"] for media in media_entities]
-            media_types = [media["type"] for media in media_entities]
-            media_sizes = {
-                media["media_key"]: media["sizes"] for media in media_entities
-            }
-
-            params = (
-                tweet_results["rest_id"],
-                tweet_results.get("note_tweet", {})
-                .get("note_tweet_results", {})
-                .get("result", {})
-                .get("text", legacy.get("full_text", "")),
-                legacy.get("favorite_count", 0),
-                legacy.get("retweet_count", 0),
-                legacy.get("reply_count", 0),
-                legacy.get("quote_count", 0),
-                legacy.get("bookmark_count", 0),
-                legacy.get("created_at", None),
-                tweet_results.get("views", {}).get("count", 0),
-                "media" in legacy.get("extended_entities", {}),
-                bool(legacy.get("entities", {}).get("user_mentions", [])),
-                [
-                    mention["id_str"]
-                    for mention in legacy.get("entities", {}).get("user_mentions", [])
-                ],
-                bool(legacy.get("entities", {}).get("urls", [])),
-                bool(legacy.get("entities", {}).get("hashtags", [])),
-                bool(legacy.get("entities", {}).get("symbols", [])),
-                [
-                    symbol["text"]
-                    for symbol in legacy.get("entities", {}).get("symbols", [])
-                ],
-                legacy.get("user_id_str", ""),
-                legacy.get("possibly_sensitive", False),
-                legacy.get("lang", ""),
-                tweet_results.get("source", ""),
-                media_urls,  # Already a list
-                media_types,  # Already a list
-                json.dumps(media_sizes),
-                json.dumps(legacy.get("retweeted_status_result", {})),
-                json.dumps(tweet_results.get("quoted_status_result", {})),
-                json.dumps(tweet_results.get("card", {})),
-            )
-            params_list.append(params)
+            params_list.append(build_tweet_params(tweet_results))
         except KeyError as e:
             logging.debug(
                 f"KeyError: {e}. Omitting row for tweet_results: {tweet_results}"
@@ -232,10 +538,12 @@ def insert_tweets(db, tweet_results_list):
             )
             omitted_rows += 1
 
-    db.run_insert_query(query, params_list)
+    counts = run_upsert(db, "insert_tweets", "tweets", params_list)
     if omitted_rows > 0:
         logging.info(f"Omitted {omitted_rows} rows due to missing keys or errors.")
-    return db.cursor.rowcount
+    if return_counts:
+        return dict(counts, omitted=omitted_rows)
+    return len(params_list)
 
 
 def insert_user_recommendations(db, rest_id, recommended_user_ids):
@@ -270,7 +578,7 @@ def update_user_tweets_status(db, rest_ids):
     """
 
     params = (True, datetime.datetime.now(datetime.UTC), "idle", *rest_ids)
-    db.run_query(query, params)
+    db.execute(query, params)
 
 
 def update_user_recommendations_status(db, rest_id):
@@ -297,7 +605,27 @@ def get_most_mentioned_users(db, limit_users=5):
     return db.run_query(query, (limit_users,))
 
 
+# Mentioned ids ranked without the anti-join, per requested new user
+MENTION_CANDIDATES_FACTOR = 10
+
+
+def get_existing_user_ids(db, rest_ids):
+    if not rest_ids:
+        return set()
+    rows = db.run_query(
+        "SELECT rest_id FROM users WHERE rest_id = ANY(%s);", (list(rest_ids),)
+    )
+    return {row[0] for row in rows}
+
+
+@timer("db_query_seconds", query="get_most_mentioned_new_users")
 def get_most_mentioned_new_users(db, limit_users=5):
+    known_users = get_known_users()
+    if known_users is not None:
+        rows = get_most_mentioned_new_users_filtered(db, known_users, limit_users)
+        if rows is not None:
+            return rows
+
     query = """
         WITH mentioned_users AS (
             SELECT unnest(t.users_mentioned) AS mentioned_user_id
@@ -314,3 +642,275 @@ def get_most_mentioned_new_users(db, limit_users=5):
         LIMIT %s;
     """
     return db.run_query(query, (limit_users,))
+
+
+def get_most_mentioned_new_users_filtered(db, known_users, limit_users):
+    """
+    Ranks the mentioned ids without anti-joining the users table. Ids missing from the
+    known users filter are new for sure, only the other ones are looked up by primary key.
+
+    Returns:
+        list: Rows like get_most_mentioned_new_users, or None if the candidates ran out
+        before `limit_users` new users were found.
+    """
+    query = """
+        SELECT mentioned_user_id
+        FROM (
+            SELECT unnest(t.users_mentioned) AS mentioned_user_id
+            FROM tweets t
+            JOIN users u ON t.user_id = u.rest_id
+            WHERE u.llm_check_score > 5
+        ) AS mentioned_users
+        WHERE length(mentioned_user_id) > 3
+        GROUP BY mentioned_user_id
+        ORDER BY COUNT(*) DESC
+        LIMIT %s;
+    """
+    candidates_limit = limit_users * MENTION_CANDIDATES_FACTOR
+    candidates = [row[0] for row in db.run_query(query, (candidates_limit,))]
+    maybe_known, _ = known_users.split(candidates)
+    existing = get_existing_user_ids(db, maybe_known)
+    inc("cache_hits_total", len(candidates) - len(maybe_known), cache="known_users")
+    inc("cache_misses_total", len(maybe_known), cache="known_users")
+
+    new_users = [(rest_id,) for rest_id in candidates if rest_id not in existing]
+    new_users = new_users[:limit_users]
+    if len(new_users) < limit_users and len(candidates) == candidates_limit:
+        return None
+    return new_users
+
+
+def get_tweet_growth_curves(db, tweet_ids, since=None):
+    """
+    Returns the engagement history of tweets from tweet_metrics_history.
+
+    Returns:
+        dict: tweet_id -> list of (recorded_at, age_hours, likes, retweets, replies, quotes,
+        bookmarks, views, likes_per_hour, views_per_hour) in recording order. Velocities are
+        computed against the previous snapshot and are None for the first one.
+    """
+    if not tweet_ids:
+        return {}
+    query = """
+        SELECT
+            h.tweet_id,
+            h.recorded_at,
+            (EXTRACT(EPOCH FROM h.recorded_at - t.created_at) / 3600)::float AS age_hours,
+            h.likes,
+            h.retweets,
+            h.replies,
+            h.quotes,
+            h.bookmarks,
+            h.views,
+            ((h.likes - LAG(h.likes) OVER w)
+                / NULLIF(EXTRACT(EPOCH FROM h.recorded_at - LAG(h.recorded_at) OVER w) / 3600, 0)
+            )::float AS likes_per_hour,
+            ((h.views - LAG(h.views) OVER w)
+                / NULLIF(EXTRACT(EPOCH FROM h.recorded_at - LAG(h.recorded_at) OVER w) / 3600, 0)
+            )::float AS views_per_hour
+        FROM tweet_metrics_history h
+        JOIN tweets t ON t.tweet_id = h.tweet_id
+        WHERE h.tweet_id = ANY(%s)
+        AND (%s::timestamp IS NULL OR h.recorded_at >= %s)
+        WINDOW w AS (PARTITION BY h.tweet_id ORDER BY h.recorded_at)
+        ORDER BY h.tweet_id, h.recorded_at;
+    """
+    curves = {}
+    for row in db.run_query(query, (list(tweet_ids), since, since)) or []:
+        curves.setdefault(row[0], []).append(row[1:])
+    return curves
+
+
+def get_user_state_at(db, rest_id, at):
+    """
+    Rebuilds the profile of a user as it was at time `at` from user_snapshots.
+
+    Returns:
+        dict: Column name -> value, or None if the user had no snapshot yet.
+    """
+    query = """
+        SELECT jsonb_object_agg(key, value)
+        FROM (
+            SELECT DISTINCT ON (changes.key) changes.key, changes.value
+            FROM user_snapshots s, jsonb_each(s.changes) AS changes
+            WHERE s.rest_id = %s AND s.recorded_at <= %s
+            ORDER BY changes.key, s.recorded_at DESC
+        ) AS latest;
+    """
+    return db.run_query(query, (rest_id, at))[0][0]
+
+
+def get_user_column_series(db, rest_ids, column, since=None, until=None):
+    """
+    Returns the values a profile column took over time, e.g. followers_count.
+
+    Returns:
+        dict: rest_id -> list of (recorded_at, value). When `since` is given the series
+        starts with the value the column had at `since`.
+    """
+    if not rest_ids:
+        return {}
+    query = """
+        SELECT rest_id, recorded_at, changes -> %s
+        FROM user_snapshots
+        WHERE rest_id = ANY(%s)
+        AND changes ? %s
+        AND (%s::timestamp IS NULL OR recorded_at <= %s)
+        ORDER BY rest_id, recorded_at;
+    """
+    rows = db.run_query(query, (column, list(rest_ids), column, until, until)) or []
+    series = {}
+    for rest_id, recorded_at, value in rows:
+        points = series.setdefault(rest_id, [])
+        if since is not None and recorded_at < since:
+            # Only the last value before the window is kept, as its starting point
+            points[:] = [(since, value)]
+        else:
+            points.append((recorded_at, value))
+    return series
+
+
+def get_follower_series(db, rest_ids, since=None, until=None):
+    return get_user_column_series(db, rest_ids, "followers_count", since, until)
+
+
+def get_top_symbol_movers(db, window_start, window_end=None, limit=20, min_tweets=5):
+    """
+    Ranks cashtags by how much their tweet count in [window_start, window_end) grew
+    against the preceding window of the same length, using the symbol_hourly rollup.
+
+    Returns:
+        list: (symbol, tweet_count, previous_tweet_count, sum_views, sum_likes, growth)
+        ordered by growth. Growth is smoothed by one tweet, so new symbols rank by volume.
+    """
+    query = """
+        WITH bounds AS (
+            SELECT
+                %s::timestamp AS window_start,
+                COALESCE(%s::timestamp, LOCALTIMESTAMP) AS window_end
+        ),
+        current_window AS (
+            SELECT
+                sh.symbol,
+                SUM(sh.tweet_count) AS tweet_count,
+                SUM(sh.sum_views) AS sum_views,
+                SUM(sh.sum_likes) AS sum_likes
+            FROM symbol_hourly sh, bounds b
+            WHERE sh.hour >= b.window_start AND sh.hour < b.window_end
+            GROUP BY sh.symbol
+        ),
+        previous_window AS (
+            SELECT sh.symbol, SUM(sh.tweet_count) AS tweet_count
+            FROM symbol_hourly sh, bounds b
+            WHERE sh.hour >= b.window_start - (b.window_end - b.window_start)
+            AND sh.hour < b.window_start
+            GROUP BY sh.symbol
+        )
+        SELECT
+            c.symbol,
+            c.tweet_count::int,
+            COALESCE(p.tweet_count, 0)::int,
+            c.sum_views::bigint,
+            c.sum_likes::bigint,
+            (c.tweet_count + 1)::float / (COALESCE(p.tweet_count, 0) + 1) AS growth
+        FROM current_window c
+        LEFT JOIN previous_window p ON p.symbol = c.symbol
+        WHERE c.tweet_count >= %s
+        ORDER BY growth DESC, c.tweet_count DESC
+        LIMIT %s;
+    """
+    return db.run_query(query, (window_start, window_end, min_tweets, limit))
+
+
+def get_symbol_hourly_series(db, symbol, since, until=None):
+    """
+    Returns (hour, tweet_count, unique_users, sum_views, sum_likes) of a cashtag
+    for every hour in [since, until) that has tweets.
+    """
+    query = """
+        SELECT hour, tweet_count, unique_users, sum_views, sum_likes
+        FROM symbol_hourly
+        WHERE symbol = upper(%s)
+        AND hour >= %s
+        AND (%s::timestamp IS NULL OR hour < %s)
+        ORDER BY hour;
+    """
+    return db.run_query(query, (symbol, since, until, until))
+
+
+def get_recent_tweet_counts(db, user_ids, hours):
+    """
+    Counts the tweets of users in the last `hours` hours from user_daily_activity.
+    The rollup is daily, so the window is widened to the start of its first day.
+
+    Returns:
+        dict: user_id -> number of tweets, 0 for users without tweets in the window.
+    """
+    if not user_ids:
+        return {}
+    query = """
+        SELECT user_id, SUM(tweets)::int
+        FROM user_daily_activity
+        WHERE user_id = ANY(%s)
+        AND day >= (NOW() - INTERVAL '1 hour' * %s)::date
+        GROUP BY user_id;
+    """
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(db.run_query(query, (list(user_ids), hours)))
+    return counts
+
+
+def get_users_with_min_tweets(db, min_tweets, user_ids=None, hours=None):
+    """
+    Returns the set of users with at least `min_tweets` tweets, among `user_ids` when given
+    and in the last `hours` hours (widened to whole days) when given.
+    """
+    query = """
+        SELECT user_id
+        FROM user_daily_activity
+        WHERE (%s::text[] IS NULL OR user_id = ANY(%s))
+        AND (%s::int IS NULL OR day >= (NOW() - INTERVAL '1 hour' * %s)::date)
+        GROUP BY user_id
+        HAVING SUM(tweets) >= %s;
+    """
+    user_ids = list(user_ids) if user_ids is not None else None
+    rows = db.run_query(query, (user_ids, user_ids, hours, hours, min_tweets))
+    return {row[0] for row in rows}
+
+
+def get_top_users_by_pagerank(db, limit_users=100, unpulled_only=True):
+    """
+    Returns (rest_id, username, pagerank, in_degree) of the most central users of the
+    recommendation graph, by default only those whose recommendations were not pulled yet.
+    """
+    query = """
+        SELECT g.rest_id, u.username, g.pagerank, g.in_degree
+        FROM user_graph_metrics g
+        JOIN users u ON u.rest_id = g.rest_id
+        WHERE NOT (%s AND COALESCE(u.recommendations_pulled, FALSE))
+        ORDER BY g.pagerank DESC
+        LIMIT %s;
+    """
+    return db.run_query(query, (unpulled_only, limit_users))
+
+
+@timer("db_query_seconds", query="search_tweets")
+def search_tweets(db, query, since=None, limit=50):
+    """
+    Full-text search of tweet_text through the tweet_tsv GIN index. The query uses web
+    search syntax: words are ANDed, "quoted words" must appear as a phrase, `or` gives
+    alternatives and a leading - excludes a word.
+
+    Returns:
+        list: (tweet_id, user_id, created_at, tweet_text, rank) of the best matching
+        tweets created after `since`, by decreasing rank.
+    """
+    search_query = """
+        SELECT tweet_id, user_id, created_at, tweet_text, ts_rank_cd(tweet_tsv, q) AS rank
+        FROM tweets, websearch_to_tsquery('english', %s) AS q
+        WHERE tweet_tsv @@ q
+        AND (%s::timestamp IS NULL OR created_at >= %s)
+        ORDER BY rank DESC, views DESC NULLS LAST
+        LIMIT %s;
+    """
+    return db.run_query(search_query, (query, since, since, limit))
@@ -0,0 +1,78 @@
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# ijson prefixes of the repeated items in archived GraphQL responses, "item" marks array elements
+USER_TWEETS_INSTRUCTIONS = "data.user.result.timeline_v2.timeline.instructions.item"
+CONNECT_TAB_INSTRUCTIONS = "data.connect_tab_timeline.timeline.instructions.item"
+USERS_BY_REST_IDS_ITEMS = "data.users.item"
+
+
+def _starts_with_array(f):
+    while True:
+        char = f.read(1)
+        if not char:
+            return False
+        if not char.isspace():
+            return char == b"["
+
+
+def _walk(node, parts):
+    if not parts:
+        yield node
+        return
+    key, rest = parts[0], parts[1:]
+    if key == "item":
+        if isinstance(node, list):
+            for child in node:
+                yield from _walk(child, rest)
+    elif isinstance(node, dict) and key in node:
+        yield from _walk(node[key], rest)
+
+
+def iter_json_items(path, prefix):
+    """
+    Yields the items found under `prefix` in a JSON file one at a time.
+
+    The file may hold a single response or a list of responses (as saved for paginated
+    timelines). With ijson installed the file is parsed incrementally, so memory use does
+    not depend on the file size; otherwise it falls back to json.load.
+
+    Args:
+        path (str): Path to the JSON file.
+        prefix (str): ijson style prefix relative to a single response,
+            e.g. USERS_BY_REST_IDS_ITEMS.
+
+    Yields:
+        The decoded items, floats are returned as float rather than Decimal.
+    """
+    with open(path, "rb") as f:
+        is_array = _starts_with_array(f)
+        f.seek(0)
+        if ijson is not None:
+            full_prefix = f"item.{prefix}" if is_array else prefix
+            yield from ijson.items(f, full_prefix, use_float=True)
+        else:
+            data = json.load(f)
+            for response in data if is_array else [data]:
+                yield from _walk(response, prefix.split("."))
+
+
+def iter_timeline_entries(path, prefix):
+    """
+    Yields the entries of the TimelineAddEntries instructions found under `prefix`, other
+    instruction types are skipped. Only one instruction (a single page of entries) is held
+    in memory at a time.
+
+    Args:
+        path (str): Path to the JSON file.
+        prefix (str): ijson style prefix of the timeline instructions,
+            e.g. USER_TWEETS_INSTRUCTIONS.
+    """
+    for instruction in iter_json_items(path, prefix):
+        if instruction.get("type") != "TimelineAddEntries":
+            continue
+        yield from instruction.get("entries", [])
@@ -0,0 +1,196 @@
+import contextlib
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import numpy as np
+from utils.config import Config
+
+MAGIC = b"KNOWNUS1"
+# magic, number of bits, number of hash functions, populated flag
+HEADER = struct.Struct("<8sQII")
+HEADER_SIZE = 32
+LOAD_CHUNK_ROWS = 500000
+MASK_63 = (1 << 63) - 1
+
+
+def mix64(values, seed):
+    """
+    splitmix64 finalizer applied to an array of uint64 keys.
+    """
+    with np.errstate(over="ignore"):
+        z = values + np.uint64(seed)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def to_keys(rest_ids):
+    """
+    Numeric rest ids are used as they are, other strings are hashed to 64 bits.
+    """
+    return np.fromiter(
+        (
+            int(rest_id)
+            if rest_id.isdigit() and len(rest_id) < 19
+            else int.from_bytes(
+                hashlib.blake2b(rest_id.encode(), digest_size=8).digest(), "little"
+            )
+            & MASK_63
+            for rest_id in rest_ids
+        ),
+        dtype=np.uint64,
+        count=len(rest_ids),
+    )
+
+
+class KnownUsersFilter:
+    """
+    Bloom filter of the rest ids in the users table, kept in a memory-mapped file so that
+    every worker on the host shares the same bits and sees the users inserted by the others.
+
+    A user that is not in the filter is certainly not in the users table, as long as
+    every writer adds the users it inserts. Bits are only ever set, so readers need no
+    lock, writers serialize their read-modify-write of the bytes with flock.
+    """
+
+    def __init__(self, path, capacity=10_000_000, error_rate=0.01):
+        self.path = path
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        self.file = open(path, "a+b")
+        with self.lock():
+            if os.path.getsize(path) == 0:
+                header = HEADER.pack(MAGIC, num_bits, num_hashes, 0)
+                self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+                self.file.truncate(HEADER_SIZE + num_bits // 8)
+                self.file.flush()
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        magic, self.num_bits, self.num_hashes, _ = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a known users filter")
+        self.bits = np.frombuffer(self.mmap, dtype=np.uint8, offset=HEADER_SIZE)
+
+    @contextlib.contextmanager
+    def lock(self):
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    @property
+    def populated(self):
+        return bool(HEADER.unpack_from(self.mmap)[3])
+
+    def mark_populated(self):
+        HEADER.pack_into(self.mmap, 0, MAGIC, self.num_bits, self.num_hashes, 1)
+
+    def _positions(self, rest_ids):
+        # Double hashing: position i of a key is h1 + i * h2 modulo the number of bits
+        keys = to_keys(rest_ids)
+        h1 = mix64(keys, 0x9E3779B97F4A7C15)
+        h2 = mix64(keys, 0x632BE59BD9B4E019) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            positions = h1[:, None] + steps[None, :] * h2[:, None]
+        return positions % np.uint64(self.num_bits)
+
+    def add(self, rest_ids):
+        rest_ids = [rest_id for rest_id in rest_ids if rest_id]
+        if not rest_ids:
+            return
+        positions = self._positions(rest_ids).ravel()
+        masks = np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        with self.lock():
+            np.bitwise_or.at(
+                self.bits, (positions >> np.uint64(3)).astype(np.int64), masks
+            )
+
+    def contains(self, rest_ids):
+        """
+        Returns a boolean array, False for the rest ids that are certainly unknown.
+        """
+        if not rest_ids:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(rest_ids)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.int64)]
+        bits = (bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def split(self, rest_ids):
+        """
+        Returns (maybe_known, new) lists, the rest ids of `new` are not in the users table.
+        """
+        rest_ids = list(rest_ids)
+        known = self.contains(rest_ids)
+        maybe_known = [rest_id for rest_id, flag in zip(rest_ids, known) if flag]
+        new = [rest_id for rest_id, flag in zip(rest_ids, known) if not flag]
+        return maybe_known, new
+
+    def close(self):
+        del self.bits
+        self.mmap.close()
+        self.file.close()
+
+
+_known_users = None
+
+
+def open_known_users():
+    global _known_users
+    if _known_users is None and Config.KNOWN_USERS_FILTER_PATH:
+        _known_users = KnownUsersFilter(
+            Config.KNOWN_USERS_FILTER_PATH, Config.KNOWN_USERS_FILTER_CAPACITY
+        )
+    return _known_users
+
+
+def get_known_users():
+    """
+    Returns the process wide filter if KNOWN_USERS_FILTER_PATH is configured and the
+    filter was built from the users table, otherwise None.
+
+    The answer "certainly new" only holds if every process that writes to the users
+    table, on every host, shares this file and adds the ids it inserts. Writers started
+    without it must run load_known_users before the filter is trusted again; callers
+    must still insert with ON CONFLICT so that a stale filter cannot overwrite users.
+    """
+    known_users = open_known_users()
+    if known_users is None or not known_users.populated:
+        return None
+    return known_users
+
+
+def load_known_users(db):
+    """
+    Adds every rest id of the users table to the shared filter. Adding is idempotent, so
+    workers starting at the same time can all run it, and users written while no worker
+    was running are picked up.
+    """
+    known_users = open_known_users()
+    if known_users is None:
+        return None
+    query = """
+        SELECT rest_id FROM users
+        WHERE rest_id > %s
+        ORDER BY rest_id
+        LIMIT %s;
+    """
+    last_rest_id = ""
+    loaded = 0
+    while True:
+        rows = db.run_query(query, (last_rest_id, LOAD_CHUNK_ROWS))
+        if not rows:
+            break
+        known_users.add([row[0] for row in rows])
+        last_rest_id = rows[-1][0]
+        loaded += len(rows)
+    known_users.mark_populated()
+    logging.info(f"Loaded {loaded} users into the known users filter")
+    return known_users
@@ -0,0 +1,83 @@
+import hashlib
+import zlib
+import numpy as np
+from utils.text_utils import URL_PATTERN, WHITESPACE_PATTERN
+
+NUM_PERM = 64
+# 8 bands of 8 rows put the LSH threshold around a Jaccard similarity of 0.77
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Fixed seed, signatures must stay comparable across processes and releases
+_rng = np.random.default_rng(20240601)
+PERM_A = _rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text):
+    """
+    Returns the crc32 of the character 5-grams of a tweet, ignoring case, links and spacing.
+    """
+    text = WHITESPACE_PATTERN.sub(" ", URL_PATTERN.sub("", text.lower())).strip()
+    if not text:
+        return np.zeros(0, dtype=np.uint64)
+    grams = {
+        text[i : i + SHINGLE_SIZE]
+        for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))
+    }
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+
+
+def minhash_signature(text):
+    """
+    Returns the NUM_PERM minimums of the multiply-shift hashes (a * x + b) >> 32 of the
+    shingles as uint32, or None for tweets without text.
+    """
+    hashes = shingles(text or "")
+    if len(hashes) == 0:
+        return None
+    # Products wrap modulo 2**64, the high half is the hash
+    with np.errstate(over="ignore"):
+        permuted = hashes[:, None] * PERM_A[None, :] + PERM_B[None, :]
+    permuted >>= np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def lsh_bands(signature):
+    """
+    Hashes every band of ROWS signature values, with the band number, into a signed
+    64 bit key. Two tweets sharing any key are near-duplicate candidates.
+    """
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            bytes([band]) + rows.astype("<u4").tobytes(), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def tweet_minhash(text):
+    """
+    Returns the (minhash, lsh_bands) columns of a tweet, the signature is stored as
+    NUM_PERM little-endian uint32 values.
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return None, None
+    return signature.astype("<u4").tobytes(), lsh_bands(signature)
+
+
+def jaccard_estimate(minhash_a, minhash_b):
+    """
+    Estimates the Jaccard similarity of two tweets from their stored signatures.
+    """
+    a = np.frombuffer(bytes(minhash_a), dtype="<u4")
+    b = np.frombuffer(bytes(minhash_b), dtype="<u4")
+    return float((a == b).mean())
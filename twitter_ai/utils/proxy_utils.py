@@ -12,6 +12,23 @@ logging.basicConfig(
 
 
 class ProxyManager:
+    MARK_BAD_QUERY = """
+        UPDATE proxies 
+        SET status = 'bad', 
+            last_checked = CURRENT_TIMESTAMP, 
+            error = %s,
+            attempts = attempts + 1
+        WHERE address = %s;
+    """
+    UPDATE_TOKEN_QUERY = """
+        UPDATE proxies
+        SET x_guest_token = %s, 
+            status = 'good', 
+            last_checked = CURRENT_TIMESTAMP,
+            attempts = 0
+        WHERE address = %s;
+    """
+
     def __init__(self):
         self._init_proxies_from_csv()
 
@@ -53,15 +70,7 @@ class ProxyManager:
 
     def mark_bad(self, address, error=None):
         with get_db_connection() as db:
-            query = """
-                UPDATE proxies 
-                SET status = 'bad', 
-                    last_checked = CURRENT_TIMESTAMP, 
-                    error = %s,
-                    attempts = attempts + 1
-                WHERE address = %s;
-            """
-            db.run_query(query, (error, address))
+            db.run_query(self.MARK_BAD_QUERY, (error, address))
 
     def add_proxies(self, proxies, source):
         with get_db_connection() as db:
@@ -75,15 +84,13 @@ class ProxyManager:
 
     def update_proxy_token(self, address, token):
         with get_db_connection() as db:
-            query = """
-                UPDATE proxies
-                SET x_guest_token = %s, 
-                    status = 'good', 
-                    last_checked = CURRENT_TIMESTAMP,
-                    attempts = 0
-                WHERE address = %s;
-            """
-            db.run_query(query, (token, address))
+            db.run_query(self.UPDATE_TOKEN_QUERY, (token, address))
+
+    async def async_mark_bad(self, db, address, error=None):
+        await db.run_query(self.MARK_BAD_QUERY, (error, address))
+
+    async def async_update_proxy_token(self, db, address, token):
+        await db.run_query(self.UPDATE_TOKEN_QUERY, (token, address))
 
 
 PROXY_MANAGER = ProxyManager()
@@ -0,0 +1,173 @@
+import collections
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from utils.config import Config
+from utils.metrics import inc
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+# Recently archived hashes remembered to skip the lookup, oldest are forgotten first
+SEEN_HASHES_MAX = 100000
+
+
+class ResponseArchive:
+    """
+    Append-only archive of raw API responses stored as zstd frames in segment files.
+
+    Every response is compressed as an independent frame, so it can be read back with a
+    single seek using the (segment, offset, length) stored in the raw_responses table.
+    Responses are de-duplicated by the sha256 of their canonical JSON encoding.
+    """
+
+    def __init__(
+        self,
+        directory,
+        segment_max_bytes=SEGMENT_MAX_BYTES,
+        level=10,
+        seen_hashes_max=SEEN_HASHES_MAX,
+    ):
+        if zstandard is None:
+            raise ImportError(
+                "zstandard is required for the response archive, "
+                "install it with `pip install zstandard`"
+            )
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.segment = None
+        self.seen_hashes = collections.OrderedDict()
+        self.seen_hashes_max = seen_hashes_max
+        os.makedirs(directory, exist_ok=True)
+
+    def _current_segment(self):
+        path = os.path.join(self.directory, self.segment) if self.segment else None
+        if path is None or os.path.getsize(path) >= self.segment_max_bytes:
+            # Segment names are unique per process so parallel workers never share a file
+            self.segment = f"segment-{time.time_ns()}-{os.getpid()}.zst"
+        return self.segment
+
+    @staticmethod
+    def content_hash(payload):
+        return hashlib.sha256(payload).hexdigest()
+
+    def _remember(self, content_hash):
+        self.seen_hashes[content_hash] = True
+        self.seen_hashes.move_to_end(content_hash)
+        if len(self.seen_hashes) > self.seen_hashes_max:
+            self.seen_hashes.popitem(last=False)
+
+    def append(self, db, endpoint, response, user_id=None, fetched_at=None):
+        """
+        Compresses and appends a response unless an identical one is already archived.
+
+        Returns:
+            bool: True if the response was written, False if it was a duplicate.
+        """
+        payload = json.dumps(response, sort_keys=True, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        content_hash = self.content_hash(payload)
+        if content_hash in self.seen_hashes or db.run_query(
+            "SELECT 1 FROM raw_responses WHERE content_hash = %s;", (content_hash,)
+        ):
+            self._remember(content_hash)
+            inc("cache_hits_total", cache="response_archive")
+            return False
+
+        frame = self.compressor.compress(payload)
+        segment = self._current_segment()
+        path = os.path.join(self.directory, segment)
+        # Segments are written by this process only, the frame goes at the current end
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+        query = """
+            INSERT INTO raw_responses (
+                content_hash, endpoint, user_id, fetched_at, segment, segment_offset, length, raw_size
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (content_hash) DO NOTHING
+            RETURNING 1;
+        """
+        params = (
+            content_hash,
+            endpoint,
+            user_id,
+            fetched_at or datetime.datetime.utcnow(),
+            segment,
+            offset,
+            len(frame),
+            len(payload),
+        )
+        # The index row is committed only once the frame is on disk, and the frame is
+        # written only if the row was inserted, so neither can exist without the other
+        try:
+            db.cursor.execute(query, params)
+            inserted = db.cursor.fetchone() is not None
+            if inserted:
+                with open(path, "ab") as f:
+                    f.write(frame)
+            db.connection.commit()
+        except Exception:
+            db.connection.rollback()
+            raise
+        self._remember(content_hash)
+        return inserted
+
+    def read(self, segment, offset, length):
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        return json.loads(self.decompressor.decompress(frame))
+
+    def iter_responses(self, db, endpoint, user_id=None, since=None, until=None):
+        """
+        Yields (fetched_at, response) for archived responses of an endpoint in fetch order.
+        """
+        query = """
+            SELECT fetched_at, segment, segment_offset, length
+            FROM raw_responses
+            WHERE endpoint = %s
+            AND (%s::text IS NULL OR user_id = %s)
+            AND (%s::timestamp IS NULL OR fetched_at >= %s)
+            AND (%s::timestamp IS NULL OR fetched_at < %s)
+            ORDER BY fetched_at;
+        """
+        params = (endpoint, user_id, user_id, since, since, until, until)
+        for fetched_at, segment, offset, length in db.run_query(query, params) or []:
+            yield fetched_at, self.read(segment, offset, length)
+
+
+_response_archive = None
+
+
+def get_response_archive():
+    """
+    Returns the process wide archive if RESPONSE_ARCHIVE_DIR is configured, otherwise None.
+    """
+    global _response_archive
+    if _response_archive is None and Config.RESPONSE_ARCHIVE_DIR:
+        _response_archive = ResponseArchive(Config.RESPONSE_ARCHIVE_DIR)
+    return _response_archive
+
+
+def archive_response(db, endpoint, response, user_id=None):
+    """
+    Appends a raw response to the configured archive, never failing the ingestion path.
+    """
+    archive = get_response_archive()
+    if archive is None:
+        return
+    try:
+        archive.append(db, endpoint, response, user_id)
+    except Exception as e:
+        logging.error(f"Failed to archive {endpoint} response: {e}")
+        # Leave the connection usable for the inserts that follow
+        db.connection.rollback()
@@ -0,0 +1,23 @@
+import re
+
+URL_PATTERN = re.compile(r"https?://\S+")
+HTTPS_LINK_PATTERN = re.compile(r"https://\S+")
+MENTION_PATTERN = re.compile(r"@[A-Za-z0-9_]+")
+CASHTAG_PATTERN = re.compile(r"\$[A-Za-z0-9]+")
+HASHTAG_PATTERN = re.compile(r"#[A-Za-z0-9_]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Links go first, a mention or hashtag inside a link must not leave half of it behind
+CLEAN_TEXT_PATTERNS = [URL_PATTERN, MENTION_PATTERN, CASHTAG_PATTERN, HASHTAG_PATTERN]
+
+
+def clean_tweet_text(text):
+    """
+    Strips links, mentions, cashtags and hashtags from a tweet and collapses the spacing
+    left behind. The result is stored in the clean_text column of the tweets table.
+    """
+    if not text:
+        return ""
+    for pattern in CLEAN_TEXT_PATTERNS:
+        text = pattern.sub("", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
@@ -0,0 +1,169 @@
+import io
+import logging
+import numpy as np
+import pandas as pd
+from utils.db_utils import get_db_connection, copy_rows
+from utils.config import configure_logging
+
+configure_logging()
+
+RECENT_TWEETS_WINDOW = 20
+MIN_TWEETS_FOR_INTERVAL = 5
+DEFAULT_TWEET_INTERVAL = 150000  # seconds, used for users with less than 5 tweets
+MIN_TWEET_INTERVAL = 1100  # seconds
+MAX_TWEET_INTERVAL = 60 * 24 * 60 * 60  # seconds
+ACTIVE_WINDOW = pd.Timedelta(hours=48)
+
+FEATURE_COLUMNS = [
+    "rest_id",
+    "follow_ratio",
+    "recent_tweet_count",
+    "tweet_interval",
+    "tweets_48h",
+    "avg_views",
+    "avg_likes",
+    "last_tweet_at",
+]
+
+
+def copy_query_to_dataframe(db, query, parse_dates=None):
+    """
+    Streams the result of a query through COPY ... TO STDOUT and loads it into a DataFrame.
+    This is much faster than fetching rows through the cursor for large tables.
+    """
+    buffer = io.StringIO()
+    copy_query = f"COPY ({query}) TO STDOUT WITH CSV HEADER"
+    if hasattr(db.cursor, "copy_expert"):
+        db.cursor.copy_expert(copy_query, buffer)
+    else:
+        with db.cursor.copy(copy_query) as copy:
+            for data in copy:
+                buffer.write(bytes(data).decode("utf-8"))
+    buffer.seek(0)
+    return pd.read_csv(
+        buffer, parse_dates=parse_dates, dtype={"rest_id": str, "user_id": str}
+    )
+
+
+def load_users(db):
+    query = """
+        SELECT rest_id, followers_count, friends_count, tweets_parsed_last_timestamp
+        FROM users
+    """
+    return copy_query_to_dataframe(
+        db, query, parse_dates=["tweets_parsed_last_timestamp"]
+    )
+
+
+def load_tweets(db):
+    query = """
+        SELECT user_id, created_at, views, likes
+        FROM tweets
+        WHERE user_id IS NOT NULL
+    """
+    return copy_query_to_dataframe(db, query, parse_dates=["created_at"])
+
+
+def compute_user_features(users, tweets, now=None):
+    """
+    Computes ranking features for every user in a vectorized way.
+
+    Args:
+        users (pd.DataFrame): rest_id, followers_count, friends_count, tweets_parsed_last_timestamp.
+        tweets (pd.DataFrame): user_id, created_at, views, likes.
+        now (pd.Timestamp): Reference time for the activity window, defaults to the current UTC time.
+
+    Returns:
+        pd.DataFrame: One row per user with the columns listed in FEATURE_COLUMNS.
+    """
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+    features = users[["rest_id"]].copy()
+
+    followers = users["followers_count"].to_numpy(dtype=float)
+    friends = users["friends_count"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features["follow_ratio"] = np.where(
+            followers > 0, friends / followers, np.nan
+        )
+
+    tweets = tweets.sort_values(["user_id", "created_at"], ascending=[True, False])
+    recent = tweets[
+        tweets.groupby("user_id").cumcount().to_numpy() < RECENT_TWEETS_WINDOW
+    ]
+    recent_stats = recent.groupby("user_id").agg(
+        recent_tweet_count=("created_at", "size"),
+        min_created_at=("created_at", "min"),
+        max_created_at=("created_at", "max"),
+    )
+    all_stats = tweets.groupby("user_id").agg(
+        avg_views=("views", "mean"),
+        avg_likes=("likes", "mean"),
+        last_tweet_at=("created_at", "max"),
+    )
+    active_stats = (
+        tweets[tweets["created_at"] > now - ACTIVE_WINDOW]
+        .groupby("user_id")
+        .size()
+        .rename("tweets_48h")
+    )
+
+    features = features.join(recent_stats, on="rest_id")
+    features = features.join(all_stats, on="rest_id")
+    features = features.join(active_stats, on="rest_id")
+    features["tweets_48h"] = features["tweets_48h"].fillna(0).astype(int)
+
+    # Same rule as the tweet_interval CASE in infinite_parse.get_users_to_parse
+    max_created_at = np.fmax(
+        features["max_created_at"].to_numpy(dtype="datetime64[ns]"),
+        users["tweets_parsed_last_timestamp"].to_numpy(dtype="datetime64[ns]"),
+    )
+    span = (
+        max_created_at - features["min_created_at"].to_numpy(dtype="datetime64[ns]")
+    ) / np.timedelta64(1, "s")
+    count = features["recent_tweet_count"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # fmin/fmax skip NaN like LEAST/GREATEST skip NULL, so users without recent
+        # tweets (a NaN count, which is not < 5 either) get MAX_TWEET_INTERVAL
+        interval = np.fmax(
+            np.fmin(span / count, MAX_TWEET_INTERVAL), MIN_TWEET_INTERVAL
+        )
+    features["tweet_interval"] = np.where(
+        count < MIN_TWEETS_FOR_INTERVAL, DEFAULT_TWEET_INTERVAL, interval
+    )
+    features["recent_tweet_count"] = (
+        features["recent_tweet_count"].fillna(0).astype(int)
+    )
+
+    return features[FEATURE_COLUMNS]
+
+
+def save_user_features(db, features):
+    """
+    Replaces the content of the user_features table with the given features using COPY.
+    """
+    features = features.astype(object).where(features.notna(), None)
+    db.cursor.execute("TRUNCATE user_features;")
+    copied = copy_rows(
+        db, "user_features", FEATURE_COLUMNS, features.itertuples(index=False)
+    )
+    db.connection.commit()
+    return copied
+
+
+def main():
+    with get_db_connection(role="read") as db:
+        logging.info("Loading users and tweets")
+        users = load_users(db)
+        tweets = load_tweets(db)
+    logging.info(f"Loaded {len(users)} users and {len(tweets)} tweets")
+
+    features = compute_user_features(users, tweets)
+    with get_db_connection() as db:
+        saved = save_user_features(db, features)
+        logging.info(f"Saved features for {saved} users")
+
+
+if __name__ == "__main__":
+    main()
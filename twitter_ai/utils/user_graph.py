@@ -0,0 +1,178 @@
+import logging
+import numpy as np
+from utils.db_utils import get_db_connection, copy_rows
+from utils.user_features import copy_query_to_dataframe
+from utils.config import configure_logging
+
+configure_logging()
+
+DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-10
+
+GRAPH_METRICS_COLUMNS = [
+    "rest_id",
+    "pagerank",
+    "in_degree",
+    "out_degree",
+    "component_id",
+    "component_size",
+]
+
+
+def load_edges(db):
+    """
+    Loads the user_recommendations edges (user -> recommended user) through COPY.
+
+    Returns:
+        tuple: Two int64 arrays with the source and target ids of every edge.
+    """
+    query = """
+        SELECT rest_id::bigint AS source, recommended_user_id::bigint AS target
+        FROM user_recommendations
+        WHERE rest_id ~ '^[0-9]+$' AND recommended_user_id ~ '^[0-9]+$'
+    """
+    edges = copy_query_to_dataframe(db, query)
+    return (
+        edges["source"].to_numpy(dtype=np.int64),
+        edges["target"].to_numpy(dtype=np.int64),
+    )
+
+
+class Graph:
+    """
+    Directed graph in CSR form: the targets of node i are indices[indptr[i]:indptr[i + 1]].
+    Nodes are dense indices into `ids`, which holds the sorted original user ids.
+    """
+
+    def __init__(self, ids, indptr, indices):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, sources, targets):
+        ids, dense = np.unique(np.concatenate([sources, targets]), return_inverse=True)
+        sources, targets = dense[: len(sources)], dense[len(sources) :]
+        # Sorting the edge keys groups the rows of the CSR, equal neighbours are duplicates.
+        # A plain sort is much faster than np.unique on millions of keys.
+        edges = np.sort(sources * len(ids) + targets)
+        unique = np.ones(len(edges), dtype=bool)
+        unique[1:] = edges[1:] != edges[:-1]
+        edges = edges[unique]
+        sources, targets = np.divmod(edges, len(ids))
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(ids)), out=indptr[1:])
+        return cls(ids, indptr, targets)
+
+    @property
+    def nodes_count(self):
+        return len(self.ids)
+
+    def sources(self):
+        return np.repeat(np.arange(self.nodes_count), self.out_degree())
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=self.nodes_count)
+
+
+def pagerank(graph, damping=DAMPING, max_iterations=MAX_ITERATIONS, tol=TOLERANCE):
+    """
+    Power iteration of PageRank. The rank of nodes without outgoing edges is spread
+    uniformly over all nodes, so the ranks always sum to 1.
+    """
+    n = graph.nodes_count
+    if n == 0:
+        return np.zeros(0)
+    out_degree = graph.out_degree()
+    dangling = out_degree == 0
+    with np.errstate(divide="ignore"):
+        inverse_degree = np.where(dangling, 0.0, 1.0 / out_degree)
+    ranks = np.full(n, 1.0 / n)
+
+    for _ in range(max_iterations):
+        contributions = np.repeat(ranks * inverse_degree, out_degree)
+        new_ranks = np.bincount(graph.indices, weights=contributions, minlength=n)
+        new_ranks = damping * new_ranks + (1 - damping + damping * ranks[dangling].sum()) / n
+        converged = np.abs(new_ranks - ranks).sum() < tol
+        ranks = new_ranks
+        if converged:
+            break
+    return ranks
+
+
+def connected_components(graph):
+    """
+    Weakly connected components by hooking the label of both ends of every edge to their
+    minimum and compressing the label chains until no edge joins two labels.
+
+    Returns:
+        np.ndarray: The component of every node, i.e. the smallest node index in it.
+    """
+    labels = np.arange(graph.nodes_count)
+    sources, targets = graph.sources(), graph.indices
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        lowest = np.minimum(source_labels, target_labels)
+        hooked = labels.copy()
+        np.minimum.at(hooked, source_labels, lowest)
+        np.minimum.at(hooked, target_labels, lowest)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def compute_graph_metrics(sources, targets):
+    """
+    Computes PageRank, degrees and connected components of the recommendation graph.
+
+    Returns:
+        dict: Column name -> array with one value per user, see GRAPH_METRICS_COLUMNS.
+    """
+    graph = Graph.from_edges(sources, targets)
+    components = connected_components(graph)
+    return {
+        "rest_id": graph.ids,
+        "pagerank": pagerank(graph),
+        "in_degree": graph.in_degree(),
+        "out_degree": graph.out_degree(),
+        "component_id": graph.ids[components],
+        "component_size": np.bincount(components, minlength=graph.nodes_count)[
+            components
+        ],
+    }
+
+
+def save_graph_metrics(db, metrics):
+    """
+    Replaces the content of the user_graph_metrics table with the given metrics using COPY.
+    """
+    rows = zip(*(metrics[column].tolist() for column in GRAPH_METRICS_COLUMNS))
+    db.cursor.execute("TRUNCATE user_graph_metrics;")
+    copied = copy_rows(db, "user_graph_metrics", GRAPH_METRICS_COLUMNS, rows)
+    db.connection.commit()
+    return copied
+
+
+def main():
+    with get_db_connection(role="read") as db:
+        logging.info("Loading recommendation edges")
+        sources, targets = load_edges(db)
+    logging.info(f"Loaded {len(sources)} edges")
+
+    metrics = compute_graph_metrics(sources, targets)
+    with get_db_connection() as db:
+        saved = save_graph_metrics(db, metrics)
+        logging.info(f"Saved graph metrics for {saved} users")
+
+
+if __name__ == "__main__":
+    main()